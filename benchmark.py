@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the sudoku solvers.
+
+    python benchmark.py                            # every board in sudoku_boards/ through every backend
+    python benchmark.py --generated 10             # plus 10 generated minimal 9x9 puzzles
+    python benchmark.py --encoding sequential      # same, with a different at-most-one encoding
+    python benchmark.py --save baseline.json       # keep the results ...
+    python benchmark.py --baseline baseline.json   # ... and flag what got slower since
+    python benchmark.py --startup                  # cold starts instead: imports, first solves, a pool worker
+
+Every board is solved by every backend and reported with its wall time, and for the SAT backend also the
+preprocessing time (on by default, as in the server; --no-preprocess leaves it out), the formula build time and the
+search time, the solver's counters (decisions, propagations, conflicts, ...) and clause counts.
+Peak memory is measured in a separate run under tracemalloc so that its overhead does not leak into the timings.
+
+With --startup, every step in STARTUP_STEPS is timed in a fresh interpreter instead, since that is the only way to
+see import costs; the results can be saved and compared against a baseline the same way.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+
+import main as solver
+import sat
+import server
+import generator
+import preprocess as preprocessing
+from cnf import CNF, encode_formula
+
+LOCATION = os.path.realpath(os.path.dirname(__file__))
+BOARDS = os.path.join(LOCATION, 'sudoku_boards')
+TOLERANCE = 0.25  # relative slowdown past which a result is flagged as a regression
+NOISE_SECONDS = 0.002  # slowdowns smaller than this are timer noise, never regressions
+STARTUP_BOARD = [[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]]  # an easy puzzle: starting up is timed, not search
+# name -> (setup, timed step): each runs in a fresh interpreter and only the step is timed
+STARTUP_STEPS = {
+    'import': ("", "import server"),
+    'sat': ("import server", "server.solve({'board': BOARD, 'backend': 'sat', 'cache': False})"),
+    'bitmask': ("import server", "server.solve({'board': BOARD, 'backend': 'bitmask', 'cache': False})"),
+    'dlx': ("import server", "server.solve({'board': BOARD, 'backend': 'dlx', 'cache': False})"),
+    'worker': ("import server, concurrent.futures.process; server.preload()",
+               "server.get_pool(1).submit(server.timed_solve, BOARD).result()"),
+}
+
+
+def load_boards(pattern='*.json'):
+    """returns a sorted list of (name, board) for the board files in sudoku_boards/ matching the pattern"""
+    boards = []
+    for path in sorted(glob.glob(os.path.join(BOARDS, pattern))):
+        with open(path) as f:
+            boards.append((os.path.basename(path), json.load(f)))
+    return boards
+
+
+def generated_boards(count, n=9, seed=0):
+    """returns count (name, board) pairs of minimal puzzles made by generator.py; the same seed gives the same boards"""
+    return [(f"generated{n}_{seed}_{k}", board) for k, (board, rating) in enumerate(generator.generate_many(count, n, seed))]
+
+
+def formula_size(board, at_most_one='pairwise'):
+    """builds the SAT formula for a board and returns its variable, clause and literal counts and build time"""
+    start = time.perf_counter()
+    cnf, variables = encode_formula(solver.sudoku_clauses(board, at_most_one))
+    build = time.perf_counter() - start
+    return {'variables': cnf.num_vars, 'clauses': len(cnf), 'literals': len(cnf.literals), 'build_seconds': build}
+
+
+def time_solve(board, backend, **options):
+    """solves a board with one server backend and returns (seconds, solved board or None)"""
+    start = time.perf_counter()
+    result = server.backends[backend](board, **options)
+    return time.perf_counter() - start, result
+
+
+def measure_sat(board, at_most_one='pairwise', mode='dpll', heuristic='first', preprocess=True, deadline=None):
+    """
+    solves a board with the SAT backend in timed phases, preprocessing, building the formula (encoding and loading
+    it into the solver) and searching, and returns the timings along with the formula size and the solver's counters
+    with preprocess, as server.solve_sat does by default, the board goes through preprocess.reduce_board first and
+    the encoded formula through preprocess.simplify_cnf; a board either of them settles is never searched
+    """
+    start = time.perf_counter()
+    candidates = None
+    cnf = CNF()
+    search = sat.Solver(cnf)  # an empty search, for the counters of a board that preprocessing settles
+    build = pre = 0.0
+    solved = True
+    if preprocess:
+        reduced = preprocessing.reduce_board(board, deadline=deadline)
+        pre = time.perf_counter() - start
+        if reduced is None:
+            solved = False
+        else:
+            board, candidates = reduced
+            solved = not candidates
+    if not preprocess or candidates:
+        built = time.perf_counter()
+        cnf, variables = encode_formula(solver.sudoku_clauses(board, at_most_one, candidates), deadline=deadline)
+        build = time.perf_counter() - built
+        if preprocess:
+            simplified = time.perf_counter()
+            cnf = preprocessing.simplify_cnf(cnf, deadline)
+            pre += time.perf_counter() - simplified
+        if cnf is None:
+            cnf, solved = CNF(), False
+        else:
+            loaded = time.perf_counter()
+            groups = solver.candidate_groups(variables) if heuristic == 'mrv' else None
+            search = sat.Solver(cnf, mode, heuristic, groups, deadline)
+            build += time.perf_counter() - loaded
+            solved = search.solve(deadline)
+    end = time.perf_counter()
+    return dict(search.counters(), seconds=end - start, preprocess_seconds=pre, build_seconds=build,
+                search_seconds=end - start - pre - build, solved=solved,
+                variables=cnf.num_vars, clauses=len(cnf), literals=len(cnf.literals))
+
+
+def measure(board, backend, repeat=1, timeout=None, **sat_options):
+    """
+    runs one backend on a board repeat times and returns the fastest run's metrics plus the peak memory of one more
+    run; a run that does not finish within timeout seconds is reported as {'timeout': timeout}
+    """
+    def run():
+        deadline = time.time() + timeout if timeout else None
+        if backend == 'sat':
+            return measure_sat(board, deadline=deadline, **sat_options)
+        seconds, result = time_solve(board, backend, deadline=deadline)
+        return {'seconds': seconds, 'solved': result is not None}
+
+    try:
+        best = min((run() for _ in range(repeat)), key=lambda metrics: metrics['seconds'])
+        tracemalloc.start()
+        try:
+            run()
+            best['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    except TimeoutError:
+        return {'timeout': timeout}
+    return best
+
+
+def run_suite(boards, backends=('sat', 'bitmask', 'dlx'), repeat=1, timeout=None, **sat_options):
+    """
+    returns the benchmark results as a JSON-ready dict: the settings, and under 'results' one
+    {'board', 'n', 'backend', ...metrics} row per board and backend, sorted by board size
+    """
+    rows = []
+    for name, board in sorted(boards, key=lambda item: (len(item[1]), item[0])):
+        for backend in backends:
+            row = {'board': name, 'n': len(board), 'backend': backend}
+            row.update(measure(board, backend, repeat, timeout, **sat_options))
+            rows.append(row)
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'repeat': repeat, 'sat_options': sat_options, 'results': rows}
+
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    """
+    compares two run_suite results and returns a message for every board/backend pair that got slower than
+    (1 + tolerance) times its baseline time, needed more decisions than its baseline, or stopped finishing
+    """
+    before = {(row['board'], row['backend']): row for row in baseline['results']}
+    found = []
+    for row in results['results']:
+        old = before.get((row['board'], row['backend']))
+        if old is None:
+            continue
+        label = f"{row['board']} [{row['backend']}]"
+        if 'timeout' in row:
+            if 'timeout' not in old:
+                found.append(f"{label}: timed out, took {old['seconds']:.4f} s before")
+            continue
+        if 'timeout' in old:
+            continue
+        if row['seconds'] > old['seconds'] * (1 + tolerance) and row['seconds'] - old['seconds'] > NOISE_SECONDS:
+            found.append(f"{label}: {row['seconds']:.4f} s, was {old['seconds']:.4f} s "
+                         f"({row['seconds'] / old['seconds'] - 1:+.0%})")
+        if row.get('decisions', 0) > old.get('decisions', row.get('decisions', 0)) * (1 + tolerance):
+            found.append(f"{label}: {row['decisions']} decisions, was {old['decisions']}")
+    return found
+
+
+def time_startup(setup, step):
+    """runs setup then step in a fresh interpreter and returns the seconds step took"""
+    code = (f"import time\nBOARD = {STARTUP_BOARD!r}\n{setup}\nstart = time.perf_counter()\n{step}\n"
+            f"print(time.perf_counter() - start)")
+    done = subprocess.run([sys.executable, '-c', code], cwd=LOCATION, capture_output=True, text=True, check=True)
+    return float(done.stdout.split()[-1])
+
+
+def run_startup(repeat=5):
+    """
+    returns the cold start benchmark as a JSON-ready dict shaped like run_suite's, with one 'startup' row per
+    step of STARTUP_STEPS holding its fastest time over repeat fresh interpreters
+    """
+    rows = [{'board': 'startup', 'n': len(STARTUP_BOARD), 'backend': name,
+             'seconds': min(time_startup(setup, step) for _ in range(repeat))}
+            for name, (setup, step) in STARTUP_STEPS.items()]
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'repeat': repeat, 'results': rows}
+
+
+def print_report(results):
+    print(f"{'board':<22}{'n':>4}{'backend':>9}{'total s':>10}{'pre s':>10}{'build s':>10}{'search s':>10}"
+          f"{'decisions':>11}{'props':>10}{'clauses':>10}{'peak KiB':>10}")
+    for row in results['results']:
+        line = f"{row['board']:<22}{row['n']:>4}{row['backend']:>9}"
+        if 'timeout' in row:
+            print(line + f"{'timeout':>10}")
+            continue
+        line += f"{row['seconds']:>10.4f}"
+        if row['backend'] == 'sat':
+            line += (f"{row['preprocess_seconds']:>10.4f}{row['build_seconds']:>10.4f}{row['search_seconds']:>10.4f}"
+                     f"{row['decisions']:>11}{row['propagations']:>10}{row['clauses']:>10}")
+        else:
+            line += ' ' * 61
+        print(line + f"{row['peak_bytes'] / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="time every backend on the example boards and track regressions")
+    parser.add_argument('--boards', default='*.json', help="glob of board files in sudoku_boards/")
+    parser.add_argument('--generated', type=int, default=0, help="also solve this many generated minimal 9x9 puzzles")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the generated puzzles")
+    parser.add_argument('--backends', nargs='+', default=['sat', 'bitmask', 'dlx'], choices=sorted(server.backends))
+    parser.add_argument('--encoding', default='pairwise', choices=solver.AT_MOST_ONE_ENCODINGS)
+    parser.add_argument('--mode', default='dpll', choices=sat.MODES)
+    parser.add_argument('--heuristic', default='first', choices=sat.HEURISTICS)
+    parser.add_argument('--no-preprocess', dest='preprocess', action='store_false',
+                        help="time the SAT backend without preprocessing, unlike the server's default")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per board, the fastest is kept")
+    parser.add_argument('--timeout', type=float, default=60.0, help="seconds allowed per run")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file of an earlier --save to flag regressions against")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="relative slowdown flagged as a regression")
+    parser.add_argument('--startup', action='store_true', help="time cold starts in fresh interpreters instead")
+    args = parser.parse_args()
+
+    if args.startup:
+        results = run_startup(max(args.repeat, 5))
+        for row in results['results']:
+            print(f"{row['backend']:<10}{row['seconds'] * 1000:>10.2f} ms")
+    else:
+        boards = load_boards(args.boards) + generated_boards(args.generated, seed=args.seed)
+        results = run_suite(boards, args.backends, args.repeat, args.timeout,
+                            at_most_one=args.encoding, mode=args.mode, heuristic=args.heuristic,
+                            preprocess=args.preprocess)
+        print_report(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for message in found:
+            print("REGRESSION", message)
+        if found:
+            sys.exit(1)
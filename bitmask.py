@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Native sudoku solver that works directly on the board, without building a SAT formula.
+
+Every row, column and box keeps the values it already holds as an int bitmask (bit v-1 set for value v),
+so the candidates of a cell are one OR and one AND away. Search alternates naked/hidden single
+propagation with backtracking on the cell that has the fewest candidates (MRV), using an explicit
+stack of board states so deep boards never recurse.
+"""
+
+import time
+
+import grid
+
+DEADLINE_CHECK_INTERVAL = 64  # search steps between two looks at the clock when a deadline is set
+
+
+def units(n):
+    """
+    Given a board size n, returns (cell_units, unit_cells) for the flat cell indices r * n + c:
+    cell_units[i] is the (row, column, box) index triple of cell i, and unit_cells lists the cells of every
+    row, then every column, then every box. Both come from the shared tables of grid.py.
+    >>> cell_units, unit_cells = units(4)
+    >>> cell_units[6], unit_cells[0], unit_cells[4], unit_cells[11]
+    ((1, 2, 1), (0, 1, 2, 3), (0, 4, 8, 12), (10, 11, 14, 15))
+    """
+    t = grid.table(n)
+    return t.cell_units, t.unit_cells
+
+
+def _place(values, used, cell_units, i, v):
+    """Writes value v in empty cell i. Returns False if v is already used by one of the cell's units."""
+    bit = 1 << (v - 1)
+    r, c, b = cell_units[i]
+    n = len(used) // 3
+    if (used[r] | used[n + c] | used[2 * n + b]) & bit:
+        return False
+    values[i] = v
+    used[r] |= bit
+    used[n + c] |= bit
+    used[2 * n + b] |= bit
+    return True
+
+
+def _propagate(values, used, n):
+    """
+    Fills naked singles (cells with one candidate) and hidden singles (values with one possible cell in a unit)
+    until neither applies.
+    Returns False on a contradiction, otherwise the open cell with the fewest candidates (None if the board is full).
+    The same singles run in preprocess._Candidates.singles, on per-cell candidates that other techniques also
+    narrow, and in vectorized.propagate, on a whole batch of boards; a change to the rules belongs in all three.
+    """
+    cell_units, unit_cells = units(n)
+    full = (1 << n) - 1
+    while True:
+        changed = False
+        best, best_count = None, n + 1
+        for i, v in enumerate(values):
+            if v:
+                continue
+            r, c, b = cell_units[i]
+            candidates = full & ~(used[r] | used[n + c] | used[2 * n + b])
+            if not candidates:
+                return False
+            if not candidates & (candidates - 1):
+                if not _place(values, used, cell_units, i, candidates.bit_length()):
+                    return False
+                changed = True
+            elif not changed:
+                count = bin(candidates).count('1')
+                if count < best_count:
+                    best, best_count = i, count
+        if changed:
+            continue
+
+        for u, cells in enumerate(unit_cells):
+            once = twice = 0
+            for i in cells:
+                if not values[i]:
+                    r, c, b = cell_units[i]
+                    candidates = full & ~(used[r] | used[n + c] | used[2 * n + b])
+                    twice |= once & candidates
+                    once |= candidates
+            missing = full & ~used[u]
+            if missing & ~once:
+                return False
+            singles = once & ~twice & missing
+            while singles:
+                bit = singles & -singles
+                singles ^= bit
+                for i in cells:
+                    if not values[i]:
+                        r, c, b = cell_units[i]
+                        if bit & ~(used[r] | used[n + c] | used[2 * n + b]):
+                            if not _place(values, used, cell_units, i, bit.bit_length()):
+                                return False
+                            changed = True
+                            break
+        if not changed:
+            return best
+
+
+def solve_board(board, deadline=None, stats=None):
+    """
+    Given an n-by-n board (list of lists, 0 for empty cells) with n a perfect square, returns a solved
+    copy of the board as a list of lists, or None if the board has no solution.
+    Raises TimeoutError if the search is still running at deadline (a time.time() value).
+    If a profiling.Stats is given, it receives the 'search' time, the decisions (cells branched on) and the
+    backtracks (propagations that ended in a contradiction).
+    >>> solve_board([[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]])
+    [[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]]
+    >>> solve_board([[1, 1, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]) is None
+    True
+    """
+    counts = [0, 0]  # decisions, backtracks
+    if stats is None:
+        return next(_search(board, deadline, counts), None)
+    try:
+        with stats.phase('search'):
+            return next(_search(board, deadline, counts), None)
+    finally:
+        stats.update({'decisions': counts[0], 'backtracks': counts[1]})
+
+
+def solutions(board, deadline=None, max_steps=None):
+    """
+    Lazily yields every solution of an n-by-n board as a list of lists, resuming the same search stack for
+    each one.
+    With max_steps, TimeoutError is raised once the search has looked at that many board states, which unlike
+    a deadline gives the same outcome on every machine.
+    >>> len(list(solutions([[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]])))
+    18
+    """
+    return _search(board, deadline, [0, 0], max_steps)
+
+
+def _search(board, deadline, counts, max_steps=None):
+    """generator behind solve_board and solutions, adding the decisions and backtracks it makes to counts"""
+    n = len(board)
+    cell_units, _ = units(n)
+    values = [0] * (n * n)
+    used = [0] * (3 * n)  # row masks, then column masks, then box masks
+    for i, v in enumerate(v for row in board for v in row):
+        if v and not _place(values, used, cell_units, i, v):
+            return
+
+    stack = [(values, used)]
+    steps = 0
+    while stack:
+        steps += 1
+        if deadline is not None and not steps % DEADLINE_CHECK_INTERVAL and time.time() > deadline:
+            raise TimeoutError("solver deadline exceeded")
+        if steps == max_steps:
+            raise TimeoutError("solver step budget exceeded")
+        values, used = stack.pop()
+        cell = _propagate(values, used, n)
+        if cell is False:
+            counts[1] += 1
+            continue
+        if cell is None:
+            yield [values[r * n:(r + 1) * n] for r in range(n)]
+            continue
+        counts[0] += 1
+        r, c, b = cell_units[cell]
+        candidates = ((1 << n) - 1) & ~(used[r] | used[n + c] | used[2 * n + b])
+        # push the largest value first so the smallest is tried first
+        for v in range(n, 0, -1):
+            if candidates >> (v - 1) & 1:
+                next_values, next_used = values[:], used[:]
+                _place(next_values, next_used, cell_units, cell, v)
+                stack.append((next_values, next_used))
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Solves every puzzle of a file, streaming: puzzles are read, solved and written a chunk at a time (a few chunks at
+a time when solving in parallel), so memory stays flat however large the file is. With NumPy installed, the naked
+and hidden singles of a whole chunk are filled in at once (see vectorized.py) and only the puzzles that are still
+open go to the backend.
+
+    python bulk.py puzzles.txt                       # one puzzle per line, solutions to stdout
+    python bulk.py puzzles.txt -o solved.txt -w 8    # across 8 processes
+    python bulk.py sudoku_boards/sudoku_1.json       # JSON boards, answered as JSON lines
+
+Two input formats are understood:
+    lines   one puzzle per line, n * n characters read row by row: '1'-'9' then 'A'-'Z' for the values 10 and up,
+            '0' or '.' for an empty cell (the usual 81-character format for 9x9 boards); blank lines and lines
+            starting with '#' are skipped
+    json    the layout of sudoku_boards/: a board as a list of lists, a JSON array of such boards, or any number
+            of boards one after the other (JSON lines)
+Solutions are written in the same format, one per puzzle in input order: the solved line ('-' if the puzzle has
+no solution, '!' if solving it failed), or a JSON object {"index", "solution", "seconds"} per line, with the
+reason under "error" if solving failed.
+"""
+
+import sys
+import json
+import time
+import argparse
+from math import isqrt
+from collections import deque
+
+SYMBOLS = '123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+READ_SIZE = 1 << 16  # characters read from a JSON file at a time
+CHUNK_SIZE = 64  # puzzles sent to a worker process at a time
+ERROR_LINE = '!'  # written in the line format for a puzzle whose solve failed, unlike '-' for no solution
+
+
+def parse_line(line):
+    """
+    Given one puzzle in the line format, returns the board as a list of lists.
+    >>> parse_line('1..2' '..3.' '.4..' '3..1')
+    [[1, 0, 0, 2], [0, 0, 3, 0], [0, 4, 0, 0], [3, 0, 0, 1]]
+    """
+    size = len(line)
+    n = isqrt(size)
+    if n * n != size or isqrt(n) ** 2 != n or n > len(SYMBOLS):
+        raise ValueError(f"a puzzle line must hold n * n cells with n a perfect square, got {size} characters")
+    cells = []
+    for char in line.upper():
+        if char in '0.':
+            cells.append(0)
+        else:
+            v = SYMBOLS.find(char) + 1
+            if not 0 < v <= n:
+                raise ValueError(f"unexpected character {char!r} in a {n}x{n} puzzle line")
+            cells.append(v)
+    return [cells[r * n:(r + 1) * n] for r in range(n)]
+
+
+def format_line(board):
+    """
+    Given a board (or None for no solution), returns it in the line format.
+    >>> format_line([[1, 3, 4, 2], [4, 2, 3, 1], [2, 4, 1, 3], [3, 1, 2, 4]])
+    '1342423124133124'
+    >>> format_line(None)
+    '-'
+    """
+    if board is None:
+        return '-'
+    return ''.join(SYMBOLS[v - 1] if v else '.' for row in board for v in row)
+
+
+def read_lines(f):
+    """lazily yields the boards of a file in the line format"""
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            try:
+                yield parse_line(line)
+            except ValueError as e:
+                raise ValueError(f"line {number}: {e}") from None
+
+
+def _json_values(f):
+    """lazily yields the top-level JSON values of a file holding any number of them, one after the other"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            if eof:
+                return
+            chunk = f.read(READ_SIZE)
+            buffer, eof = chunk, not chunk
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # the value may just be cut by the end of the buffer
+            if eof:
+                raise
+            chunk = f.read(READ_SIZE)
+            buffer, eof = buffer + chunk, not chunk
+            continue
+        yield value
+        buffer = buffer[end:]
+
+
+def read_json(f):
+    """
+    Lazily yields the boards of a file in the JSON format. A top-level array of boards is read element by element
+    rather than as one value, so a single huge array does not have to fit in memory.
+    >>> import io
+    >>> [len(board) for board in read_json(io.StringIO('[[[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]]'))]
+    [4]
+    >>> [len(board) for board in read_json(io.StringIO('[[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]] [[0]]'))]
+    [4, 1]
+    """
+    decoder = json.JSONDecoder()
+    head = f.read(READ_SIZE)
+    start = len(head) - len(head.lstrip())
+    # '[[[' opens an array of boards, anything else is one or more boards in a row
+    if not ''.join(head[start:start + 64].split()).startswith('[[['):
+        yield from _json_values(_Prepended(head, f))
+        return
+
+    buffer = head[start + 1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            board, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(READ_SIZE)
+            buffer, eof = buffer + chunk, not chunk
+            continue
+        yield board
+        buffer = buffer[end:]
+
+
+class _Prepended:
+    """a file whose first read returns some text that was already read from it"""
+
+    def __init__(self, text, f):
+        self.text, self.f = text, f
+
+    def read(self, size):
+        if self.text:
+            text, self.text = self.text, ''
+            return text
+        return self.f.read(size)
+
+
+def read_puzzles(f, format='lines'):
+    """lazily yields the boards of an open file in the given format ('lines' or 'json')"""
+    if format == 'lines':
+        return read_lines(f)
+    if format == 'json':
+        return read_json(f)
+    raise ValueError(f"unknown puzzle format {format!r}, expected 'lines' or 'json'")
+
+
+def solve_chunk(jobs):
+    """
+    solves a list of solve payloads, returning one server.timed_solve result per payload
+    with NumPy the boards are first propagated together and only the ones left open are solved by the backend,
+    every result's seconds then includes an equal share of the propagation time
+    the jobs of a chunk share their options: propagation must finish within one puzzle's 'timeout' (or by its
+    'deadline'), and each search gets what is left of the timeout after its board's share of propagation
+    the answers are the same with or without NumPy, which this example runs through when it is installed:
+    >>> boards = ([[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]], [[0] * 4] * 4, [[1, 1, 0, 0]] + [[0] * 4] * 3)
+    >>> [result['solution'] for result in solve_chunk([{'board': board, 'backend': 'bitmask'} for board in boards])]
+    [[[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]], [[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 1]], None]
+    >>> boards += ([[5, 0, 0, 0]] + [[0] * 4] * 3,)  # out of range, so NumPy hands every board to the backend
+    >>> [result['solution'] for result in solve_chunk([{'board': board, 'backend': 'bitmask'} for board in boards])][1:]
+    [[[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 1]], None, None]
+    """
+    import server
+    import vectorized  # and NumPy with it, only once there is something to solve
+    if vectorized.np is None or any(job.get('stats') for job in jobs):
+        return [server.timed_solve(job) for job in jobs]
+    timeout = jobs[0].get('timeout')
+    deadline = jobs[0].get('deadline', None if timeout is None else time.time() + float(timeout))
+    start = time.perf_counter()
+    try:
+        propagated = vectorized.propagate_boards([job['board'] for job in jobs], deadline)
+    except (ValueError, TypeError):
+        # a malformed board in the chunk, let each board report its own error
+        return [server.timed_solve(job) for job in jobs]
+    except TimeoutError:
+        propagated = None  # every board is searched from its givens with the time it has left
+    share = (time.perf_counter() - start) / len(jobs)
+    results = []
+    for k, job in enumerate(jobs):
+        board = job['board'] if propagated is None else propagated[k]
+        if propagated is not None and (board is None or all(all(row) for row in board)):
+            result = {'solution': board, 'seconds': 0.0}
+        else:
+            if timeout is not None:
+                job = dict(job, timeout=max(float(timeout) - share, 0.0))
+            result = server.timed_solve(dict(job, board=board))
+        result['seconds'] += share
+        results.append(result)
+    return results
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def solve_stream(boards, workers=1, **options):
+    """
+    Lazily yields one server.timed_solve result per board, in input order. The options go to server.solve
+    (backend, timeout, mode, ...). With several workers the boards are solved in chunks across the process pool,
+    keeping only a few chunks per worker in flight so a slow consumer or a huge input never piles up in memory.
+    >>> [result['solution'] for result in solve_stream([[[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]]])]
+    [[[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]]]
+    """
+    import server
+    # the cache would cost a canonical form per board and rarely hit across a dataset of distinct puzzles
+    jobs = (dict(options, board=board, cache=False) for board in boards)
+    if workers == 1:
+        for chunk in _chunks(jobs, CHUNK_SIZE):
+            yield from solve_chunk(chunk)
+        return
+
+    pool = server.get_pool(workers)
+    pending = deque()
+    for chunk in _chunks(jobs, CHUNK_SIZE):
+        pending.append(pool.submit(solve_chunk, chunk))
+        if len(pending) >= 2 * server._pool_workers:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def write_results(results, out, format='lines'):
+    """writes every result of solve_stream to out as soon as it is ready, returns a summary of the run"""
+    summary = {'puzzles': 0, 'solved': 0, 'unsolvable': 0, 'errors': 0}
+    for index, result in enumerate(results):
+        summary['puzzles'] += 1
+        if 'error' in result:
+            summary['errors'] += 1
+        elif result['solution'] is None:
+            summary['unsolvable'] += 1
+        else:
+            summary['solved'] += 1
+        if format == 'lines':
+            out.write((ERROR_LINE if 'error' in result else format_line(result['solution'])) + '\n')
+        else:
+            out.write(json.dumps(dict(result, index=index)) + '\n')
+    return summary
+
+
+if __name__ == "__main__":
+    import main as solver
+    import server
+
+    parser = argparse.ArgumentParser(description="solve every puzzle of a file, streaming")
+    parser.add_argument('puzzles', help="puzzle file, '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="solution file, '-' (the default) for stdout")
+    parser.add_argument('-f', '--format', choices=('lines', 'json'),
+                        help="input format, guessed from the file extension by default (.json and .jsonl are json)")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="solver processes")
+    parser.add_argument('--backend', default='bitmask', choices=sorted(server.backends))
+    parser.add_argument('--timeout', type=float, help="seconds allowed per puzzle")
+    parser.add_argument('--mode', choices=solver.sat.MODES, help="SAT backend only")
+    parser.add_argument('--heuristic', choices=solver.sat.HEURISTICS, help="SAT backend only")
+    parser.add_argument('--encoding', choices=solver.AT_MOST_ONE_ENCODINGS, help="SAT backend only")
+    args = parser.parse_args()
+
+    format = args.format or ('json' if args.puzzles.endswith(('.json', '.jsonl')) else 'lines')
+    options = {'backend': args.backend}
+    for name, value in (('timeout', args.timeout), ('mode', args.mode),
+                        ('heuristic', args.heuristic), ('at_most_one', args.encoding)):
+        if value is not None:
+            options[name] = value
+
+    start = time.perf_counter()
+    infile = sys.stdin if args.puzzles == '-' else open(args.puzzles)
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w')
+    with infile, outfile:
+        summary = write_results(solve_stream(read_puzzles(infile, format), args.workers, **options), outfile, format)
+    seconds = time.perf_counter() - start
+    print(f"{summary['puzzles']} puzzles in {seconds:.2f} s: {summary['solved']} solved, "
+          f"{summary['unsolvable']} unsolvable, {summary['errors']} errors", file=sys.stderr)
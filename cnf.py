@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Compact integer-literal CNF representation used by the SAT engine.
+
+Variables are numbered 1..num_vars and literals are signed ints (DIMACS style):
+v means "variable v is True" and -v means "variable v is False".
+Clauses are stored back to back in one flat array('i') buffer, with a second
+buffer recording where each clause starts, so a formula costs a few bytes per
+literal instead of a list of nested tuples per clause.
+
+The tuple formulas produced by main.sudoku_board_to_sat_formula, i.e. lists of
+clauses like [(((r, c), val), True), ...], are translated at the edges with
+encode_formula / decode_model.
+"""
+
+import time
+from array import array
+
+CLOCK_INTERVAL = 1024  # clauses encoded between two looks at the clock when a deadline is set
+
+
+class CNF:
+    """
+    A CNF formula over integer variables 1..num_vars.
+    >>> formula = CNF()
+    >>> formula.add_clause([1, -2, 3])
+    >>> formula.add_clause([2])
+    >>> len(formula), formula.num_vars
+    (2, 3)
+    >>> [list(clause) for clause in formula]
+    [[1, -2, 3], [2]]
+    """
+
+    def __init__(self, num_vars=0):
+        self.num_vars = num_vars
+        self.literals = array('i')
+        self.starts = array('i', [0])
+
+    def new_var(self):
+        """Allocates a fresh variable and returns its number."""
+        self.num_vars += 1
+        return self.num_vars
+
+    def add_clause(self, clause):
+        """Appends a clause given as an iterable of signed int literals."""
+        literals = self.literals
+        literals.extend(clause)
+        start = self.starts[-1]
+        if len(literals) > start:
+            top = max(max(literals[start:]), -min(literals[start:]))
+            if top > self.num_vars:
+                self.num_vars = top
+        self.starts.append(len(literals))
+
+    def clause(self, i):
+        """Returns the literals of the i-th clause as an array('i')."""
+        return self.literals[self.starts[i]:self.starts[i + 1]]
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def __iter__(self):
+        literals, starts = self.literals, self.starts
+        for i in range(len(starts) - 1):
+            yield literals[starts[i]:starts[i + 1]]
+
+
+class VariableMap:
+    """
+    Numbers arbitrary hashable variables, e.g. ((r, c), val), as 1, 2, 3, ...
+    >>> variables = VariableMap()
+    >>> variables.literal(((0, 1), 4), True), variables.literal(((2, 3), 1), False)
+    (1, -2)
+    >>> variables.literal(((0, 1), 4), False)
+    -1
+    >>> variables[2]
+    ((2, 3), 1)
+    """
+
+    def __init__(self):
+        self.numbers = {}
+        self.names = [None]
+
+    def number(self, var):
+        """Returns the int for var, allocating the next free one the first time var is seen."""
+        num = self.numbers.get(var)
+        if num is None:
+            num = self.numbers[var] = len(self.names)
+            self.names.append(var)
+        return num
+
+    def literal(self, var, value):
+        """Returns the signed literal asserting var == value."""
+        num = self.number(var)
+        return num if value else -num
+
+    def __getitem__(self, num):
+        return self.names[num]
+
+    def __len__(self):
+        return len(self.names) - 1
+
+
+def encode_formula(formula, variables=None, deadline=None):
+    """
+    Given a tuple formula (list of clauses of (var, bool) literals), returns (cnf, variables)
+    where cnf is the equivalent CNF and variables maps its ints back to the original vars.
+    The formula may be a generator building its clauses on the fly; TimeoutError is raised if building and
+    encoding them are still running at deadline (a time.time() value).
+    >>> cnf, variables = encode_formula([[('a', True), ('b', False)], [('b', True)]])
+    >>> [list(clause) for clause in cnf], variables[1], variables[2]
+    ([[1, -2], [2]], 'a', 'b')
+    """
+    if variables is None:
+        variables = VariableMap()
+    cnf = CNF()
+    literal = variables.literal
+    for count, clause in enumerate(formula):
+        if deadline is not None and not count % CLOCK_INTERVAL and time.time() > deadline:
+            raise TimeoutError("solver deadline exceeded")
+        cnf.add_clause([literal(var, value) for var, value in clause])
+    cnf.num_vars = len(variables)
+    return cnf, variables
+
+
+def decode_model(model, variables):
+    """
+    Given a model (sequence indexed by variable number holding 1 for True, -1 for False and
+    0 for unassigned) and the VariableMap it was encoded with, returns {var: bool} for every
+    assigned variable, in the dictionary form satisfying_assignment has always returned.
+    >>> cnf, variables = encode_formula([[('a', True), ('b', False)]])
+    >>> decode_model([0, 1, 0], variables)
+    {'a': True}
+    """
+    names = variables.names
+    return {names[num]: value > 0 for num, value in enumerate(model) if value and num < len(names)}
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+DIMACS CNF files, and external SAT solvers that read them.
+
+    python dimacs.py export sudoku_boards/sudoku_1.json board.cnf   # board.cnf and its board.cnf.map.json
+    kissat board.cnf > model.txt                                     # any solver, or: python dimacs.py solve board.cnf
+    python dimacs.py decode board.cnf.map.json model.txt             # the solved board
+
+The formula is streamed to the file clause by clause while its variables are numbered, so even a huge formula
+never exists as a Python list; the 'p cnf' header, whose counts are only known at the end, is written as a
+fixed-width placeholder and filled in afterwards. The variable map (number -> ((r, c), val) or auxiliary
+variable) goes to a JSON file next to it.
+
+A solver's answer is read in the SAT competition format ('s SATISFIABLE' and 'v' lines on stdout) or in
+MiniSat's result file format ('SAT' then the literals); see external_assignment for running one.
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import argparse
+import tempfile
+import subprocess
+from array import array
+
+import sat
+from cnf import CNF, VariableMap, decode_model
+
+HEADER_WIDTH = 40  # characters kept for the 'p cnf' line, newline included
+
+
+def write_dimacs(formula, f, variables=None):
+    """
+    Writes a formula to a text file in DIMACS CNF format and returns the VariableMap that numbers its variables.
+    formula is either a tuple formula (an iterable of clauses of (var, bool) literals, which is numbered as it is
+    written, like cnf.encode_formula does) or an already numbered cnf.CNF (then the VariableMap is the one given).
+    A tuple formula needs a seekable file, since the header is only filled in once every clause is written.
+    >>> import io
+    >>> out = io.StringIO()
+    >>> variables = write_dimacs([[('a', True), ('b', False)], [('b', True)]], out)
+    >>> print(out.getvalue().replace(' ' * 10, ''))
+    p cnf 2 2
+    1 -2 0
+    2 0
+    <BLANKLINE>
+    >>> variables[2]
+    'b'
+    """
+    if isinstance(formula, CNF):
+        f.write(f"p cnf {formula.num_vars} {len(formula)}\n")
+        for clause in formula:
+            f.write(' '.join(map(str, clause)) + ' 0\n')
+        return variables
+
+    if variables is None:
+        variables = VariableMap()
+    literal = variables.literal
+    start = f.tell()
+    f.write(' ' * (HEADER_WIDTH - 1) + '\n')
+    count = 0
+    for clause in formula:
+        f.write(''.join(f"{literal(var, value)} " for var, value in clause) + '0\n')
+        count += 1
+    end = f.tell()
+    f.seek(start)
+    f.write(f"p cnf {len(variables)} {count}".ljust(HEADER_WIDTH - 1))
+    f.seek(end)
+    return variables
+
+
+def read_dimacs(f):
+    """
+    Reads a DIMACS CNF file into a cnf.CNF, one line at a time. Clauses may span lines.
+    >>> import io
+    >>> cnf = read_dimacs(io.StringIO('c example\\np cnf 3 2\\n1 -3 0 2\\n3 0\\n'))
+    >>> cnf.num_vars, [list(clause) for clause in cnf]
+    (3, [[1, -3], [2, 3]])
+    """
+    cnf = CNF()
+    declared = 0
+    clause = []
+    for line in f:
+        tokens = line.split()
+        if not tokens or tokens[0] == 'c':
+            continue
+        if tokens[0] == 'p':
+            if len(tokens) < 4 or tokens[1] != 'cnf':
+                raise ValueError(f"expected 'p cnf <variables> <clauses>', got {line.strip()!r}")
+            declared = int(tokens[2])
+            continue
+        if tokens[0] == '%':  # end marker of the SATLIB benchmark files
+            break
+        for token in tokens:
+            lit = int(token)
+            if lit:
+                clause.append(lit)
+            else:
+                cnf.add_clause(clause)
+                clause = []
+    if clause:
+        cnf.add_clause(clause)
+    cnf.num_vars = max(cnf.num_vars, declared)
+    return cnf
+
+
+def _to_json(var):
+    return [_to_json(part) for part in var] if isinstance(var, tuple) else var
+
+
+def _from_json(var):
+    return tuple(_from_json(part) for part in var) if isinstance(var, list) else var
+
+
+def write_variable_map(variables, f):
+    """writes a VariableMap as a JSON list whose i-th entry is variable i + 1 (tuples become lists)"""
+    json.dump([_to_json(var) for var in variables.names[1:]], f)
+
+
+def read_variable_map(f):
+    """
+    reads a JSON variable map written by write_variable_map back into a VariableMap
+    >>> import io
+    >>> out = io.StringIO()
+    >>> write_variable_map(write_dimacs([[(((0, 1), 4), True)]], io.StringIO()), out)
+    >>> read_variable_map(io.StringIO(out.getvalue()))[1]
+    ((0, 1), 4)
+    """
+    variables = VariableMap()
+    for var in json.load(f):
+        variables.number(_from_json(var))
+    return variables
+
+
+def parse_model(text, num_vars):
+    """
+    Reads a solver's answer, in the SAT competition format or MiniSat's result file format, and returns the
+    model as an array indexed by variable (1 True, -1 False, 0 not given), or None if the formula is unsatisfiable.
+    Raises ValueError if the text holds no answer, e.g. because the solver gave up.
+    >>> list(parse_model('c comment\\ns SATISFIABLE\\nv 1 -2\\nv 3 0\\n', 3))
+    [0, 1, -1, 1]
+    >>> list(parse_model('SAT\\n-1 2 0\\n', 2)), parse_model('UNSAT\\n', 2)
+    ([0, -1, 1], None)
+    """
+    status = None
+    model = array('b', bytes(num_vars + 1))
+    for line in text.splitlines():
+        tokens = line.split()
+        if not tokens or tokens[0] == 'c':
+            continue
+        if tokens[0] == 's':
+            status = ' '.join(tokens[1:])
+            continue
+        if tokens[0] in ('SAT', 'UNSAT', 'INDET'):
+            status = tokens[0]
+            continue
+        if tokens[0] == 'v':
+            tokens = tokens[1:]
+        for token in tokens:
+            lit = int(token)
+            if lit and abs(lit) <= num_vars:
+                model[abs(lit)] = 1 if lit > 0 else -1
+    if status in ('SATISFIABLE', 'SAT'):
+        return model
+    if status in ('UNSATISFIABLE', 'UNSAT'):
+        return None
+    raise ValueError(f"the solver gave no answer (status {status!r})")
+
+
+def run_solver(command, path, num_vars, deadline=None):
+    """
+    Runs an external SAT solver on a DIMACS file and returns its model as parse_model does.
+    command is a shell-style string: '{cnf}' in it is replaced by the file's path (otherwise the path is appended),
+    and if it has a '{model}' the answer is read from that file instead of stdout, as MiniSat writes it.
+    Raises TimeoutError if the solver is still running at deadline (a time.time() value).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'model.txt')
+        args = [arg.replace('{cnf}', path).replace('{model}', model_path) for arg in shlex.split(command)]
+        if '{cnf}' not in command:
+            args.append(path)
+        timeout = None if deadline is None else max(deadline - time.time(), 0.001)
+        try:
+            done = subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise TimeoutError("solver deadline exceeded") from None
+        if '{model}' in command:
+            with open(model_path) as f:
+                output = f.read()
+        else:
+            output = done.stdout
+    try:
+        return parse_model(output, num_vars)
+    except ValueError:
+        raise RuntimeError(f"{args[0]} exited with status {done.returncode} without an answer: {done.stderr.strip()}")
+
+
+def external_assignment(formula, command, deadline=None):
+    """
+    Like main.satisfying_assignment, but the search runs in an external solver: the tuple formula is streamed to a
+    temporary DIMACS file, run_solver solves it, and the model is mapped back to {var: bool}, or None if unsatisfiable.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'formula.cnf')
+        with open(path, 'w') as f:
+            variables = write_dimacs(formula, f)
+        model = run_solver(command, path, len(variables), deadline)
+    return None if model is None else decode_model(model, variables)
+
+
+if __name__ == "__main__":
+    import main as solver
+
+    parser = argparse.ArgumentParser(description="write, solve and read back DIMACS CNF files")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="write a board's formula as DIMACS, with its variable map")
+    export.add_argument('board', help="board JSON file, as in sudoku_boards/")
+    export.add_argument('cnf', help="DIMACS file to write; the variable map goes to <cnf>.map.json")
+    export.add_argument('--encoding', default='pairwise', choices=solver.AT_MOST_ONE_ENCODINGS)
+    solve = commands.add_parser('solve', help="solve a DIMACS file, answering in the SAT competition format")
+    solve.add_argument('cnf')
+    solve.add_argument('--mode', default='cdcl', choices=sat.MODES)
+    solve.add_argument('--heuristic', default='vsids', choices=sat.HEURISTICS)
+    decode = commands.add_parser('decode', help="print the board a solver's answer stands for")
+    decode.add_argument('map', help="variable map written by export")
+    decode.add_argument('model', help="the solver's output")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        with open(args.board) as f:
+            board = json.load(f)
+        with open(args.cnf, 'w') as f:
+            variables = write_dimacs(solver.sudoku_clauses(board, args.encoding), f)
+        with open(args.cnf + '.map.json', 'w') as f:
+            write_variable_map(variables, f)
+    elif args.command == 'solve':
+        with open(args.cnf) as f:
+            cnf = read_dimacs(f)
+        model = sat.solve(cnf, args.mode, args.heuristic)
+        if model is None:
+            print("s UNSATISFIABLE")
+            sys.exit(20)
+        print("s SATISFIABLE")
+        print('v ' + ' '.join(str(var if model[var] == 1 else -var) for var in range(1, cnf.num_vars + 1)) + ' 0')
+        sys.exit(10)
+    else:
+        with open(args.map) as f:
+            variables = read_variable_map(f)
+        with open(args.model) as f:
+            model = parse_model(f.read(), len(variables))
+        assignments = None if model is None else decode_model(model, variables)
+        n = max((var[0][0] for var in variables.names[1:] if var[0] != 'aux'), default=-1) + 1
+        print(json.dumps(solver.assignments_to_sudoku_board(assignments, n)))
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Sudoku as an exact-cover problem, solved with Knuth's Dancing Links (Algorithm X).
+
+For an n-by-n board with sqrt(n)-by-sqrt(n) boxes there are 4 * n * n constraint columns, each of which
+must be covered exactly once:
+    cell (r, c) holds a value, row r holds value v, column c holds value v, box b holds value v
+and one matrix row per candidate placement (r, c, v) covering its four columns. The links live in flat int
+lists (left, right, up, down, column) rather than node objects, and the search runs on an explicit stack,
+so enumerating every solution is just a matter of resuming the generator.
+"""
+
+import time
+
+import grid
+
+DEADLINE_CHECK_INTERVAL = 256  # search steps between two looks at the clock when a deadline is set
+
+
+class _Matrix:
+    """Toroidal doubly linked exact-cover matrix; node 0 is the root and nodes 1..num_columns are the headers."""
+
+    def __init__(self, num_columns):
+        self.left = [i - 1 for i in range(num_columns + 1)]
+        self.right = [i + 1 for i in range(num_columns + 1)]
+        self.left[0], self.right[num_columns] = num_columns, 0
+        self.up = list(range(num_columns + 1))
+        self.down = list(range(num_columns + 1))
+        self.column = list(range(num_columns + 1))
+        self.size = [0] * (num_columns + 1)
+        self.row_of = [None] * (num_columns + 1)
+        self.decisions = 0  # rows tried by exact_covers
+        self.backtracks = 0  # columns exact_covers ran out of rows for
+
+    def add_row(self, row, columns):
+        """Appends a matrix row labelled row that has a 1 in each of the given columns."""
+        left, right, up, down, column = self.left, self.right, self.up, self.down, self.column
+        first = len(left)
+        for k, col in enumerate(columns):
+            node = first + k
+            left.append(node - 1 if k else first + len(columns) - 1)
+            right.append(node + 1 if k < len(columns) - 1 else first)
+            up.append(up[col])
+            down.append(col)
+            down[up[col]] = node
+            up[col] = node
+            column.append(col)
+            self.row_of.append(row)
+            self.size[col] += 1
+
+    def cover(self, col):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[col]], left[right[col]] = right[col], left[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                down[up[j]], up[down[j]] = down[j], up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, col):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[col]] = left[right[col]] = col
+
+    def exact_covers(self, deadline=None):
+        """
+        Yields every exact cover as a list of row labels.
+        Always branches on the column with the fewest remaining rows.
+        Raises TimeoutError if the search is still running at deadline (a time.time() value).
+        """
+        left, right, down, column, size = self.left, self.right, self.down, self.column, self.size
+        chosen = []
+        forward = True
+        steps = 0
+        while True:
+            steps += 1
+            if deadline is not None and not steps % DEADLINE_CHECK_INTERVAL and time.time() > deadline:
+                raise TimeoutError("solver deadline exceeded")
+            if forward:
+                if right[0] == 0:
+                    yield [self.row_of[node] for node in chosen]
+                    forward = False
+                    continue
+                col, best = right[0], right[0]
+                while col:
+                    if size[col] < size[best]:
+                        best = col
+                    col = right[col]
+                col = best
+                self.cover(col)
+                node = down[col]
+            else:
+                if not chosen:
+                    return
+                node = chosen.pop()
+                col = column[node]
+                j = left[node]
+                while j != node:
+                    self.uncover(column[j])
+                    j = left[j]
+                node = down[node]
+
+            if node == col:
+                self.uncover(col)
+                self.backtracks += 1
+                forward = False
+                continue
+            self.decisions += 1
+            chosen.append(node)
+            j = right[node]
+            while j != node:
+                self.cover(column[j])
+                j = right[j]
+            forward = True
+
+
+def sudoku_matrix(board):
+    """
+    Given an n-by-n board, returns the exact-cover matrix whose rows are the (r, c, v) placements still
+    allowed: only the given value for filled cells, and for empty cells every value the givens permit.
+    """
+    n = len(board)
+    cell_units = grid.table(n).cell_units  # raises ValueError unless n is a perfect square
+    cells = n * n
+    row_used = [set(v for v in row if v) for row in board]
+    column_used = [set(board[r][c] for r in range(n) if board[r][c]) for c in range(n)]
+    box_used = [set() for _ in range(n)]
+    for r, c, b in cell_units:
+        if board[r][c]:
+            box_used[b].add(board[r][c])
+
+    matrix = _Matrix(4 * cells)
+    for r, c, b in cell_units:
+        if board[r][c]:
+            values = [board[r][c]]
+        else:
+            values = [v for v in range(1, n + 1)
+                      if v not in row_used[r] and v not in column_used[c] and v not in box_used[b]]
+        for v in values:
+            matrix.add_row((r, c, v), (1 + r * n + c,
+                                       1 + cells + r * n + v - 1,
+                                       1 + 2 * cells + c * n + v - 1,
+                                       1 + 3 * cells + b * n + v - 1))
+    return matrix
+
+
+def solutions(board, deadline=None):
+    """
+    Lazily yields every solution of an n-by-n board as a list of lists, in the same shape
+    main.assignments_to_sudoku_board produces.
+    >>> board = [[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]]
+    >>> next(solutions(board))
+    [[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]]
+    >>> len(list(solutions([[0] * 4 for _ in range(4)])))
+    288
+    """
+    for placements in sudoku_matrix(board).exact_covers(deadline):
+        yield _to_board(placements, len(board))
+
+
+def _to_board(placements, n):
+    solved = [[0] * n for _ in range(n)]
+    for r, c, v in placements:
+        solved[r][c] = v
+    return solved
+
+
+def solve_board(board, deadline=None, stats=None):
+    """
+    Given an n-by-n board (list of lists, 0 for empty cells), returns a solved copy, or None if it has no solution.
+    Raises TimeoutError if the search is still running at deadline (a time.time() value).
+    If a profiling.Stats is given, it receives the 'setup' and 'search' times and the decisions and backtracks.
+    >>> solve_board([[1, 1, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]) is None
+    True
+    """
+    if stats is None:
+        return next(solutions(board, deadline), None)
+    with stats.phase('setup'):
+        matrix = sudoku_matrix(board)
+    try:
+        with stats.phase('search'):
+            placements = next(matrix.exact_covers(deadline), None)
+    finally:
+        stats.update({'decisions': matrix.decisions, 'backtracks': matrix.backtracks})
+    return None if placements is None else _to_board(placements, len(board))
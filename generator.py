@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Puzzle generator with a difficulty rating.
+
+    python generator.py 1000 -o puzzles.txt                        # 1000 9x9 puzzles, one per line
+    python generator.py 50 --difficulty hard -w 8 --seed 7         # only hard ones, across 8 processes
+    python generator.py 5 --format json -o sudoku_boards/          # as board files like the examples
+
+Every puzzle starts from a random complete grid (its diagonal boxes filled at random, the rest solved, then
+shuffled by random sudoku symmetries) and has its givens removed in random order for as long as the solution
+stays unique, so the result is minimal: taking away any given that is left would allow a second solution (on
+16x16 and larger boards, BOUNDED_SIZE, a given is also left when proving that takes too long, see minimal_puzzle).
+Puzzle k of a run only depends on the seed and on k, so the same command gives the same puzzles however many
+processes run it.
+
+The rating follows how a player would get on (see rate): 'easy' puzzles fall to naked singles, 'medium' ones
+also need hidden singles, 'hard' ones need a few guesses and 'expert' ones many.
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+from math import isqrt
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import bulk
+import bitmask
+from profiling import Stats
+
+DIFFICULTIES = ('easy', 'medium', 'hard', 'expert')
+HARD_DECISIONS = 3  # search decisions a puzzle may need and still be rated 'hard' rather than 'expert'
+MAX_ATTEMPTS = 200  # puzzles generated per requested one when looking for a given difficulty
+UNIQUENESS_STEPS = 200  # search states a uniqueness check may visit before the given it tests is kept anyway
+BOUNDED_SIZE = 16  # smallest board size whose uniqueness checks are held to UNIQUENESS_STEPS
+
+
+def solved_grid(n, rng):
+    """returns a random complete n-by-n grid"""
+    box = isqrt(n)
+    solved = None
+    while solved is None:
+        # the diagonal boxes share no row, column or box; most fillings of them can be completed
+        board = [[0] * n for _ in range(n)]
+        for b in range(box):
+            for k, v in enumerate(rng.sample(range(1, n + 1), n)):
+                board[b * box + k // box][b * box + k % box] = v
+        solved = bitmask.solve_board(board)
+    board = solved
+    rows = [b * box + r for b in rng.sample(range(box), box) for r in rng.sample(range(box), box)]
+    cols = [b * box + c for b in rng.sample(range(box), box) for c in rng.sample(range(box), box)]
+    digits = [0] + rng.sample(range(1, n + 1), n)
+    board = [[digits[board[r][c]] for c in cols] for r in rows]
+    return [list(column) for column in zip(*board)] if rng.random() < 0.5 else board
+
+
+def unique(board, max_steps=None):
+    """
+    returns whether the board has exactly one solution
+    with max_steps, raises TimeoutError when the answer takes more search than that (see bitmask.solutions)
+    """
+    count = 0
+    for _ in bitmask.solutions(board, max_steps=max_steps):
+        count += 1
+        if count > 1:
+            return False
+    return count == 1
+
+
+def minimal_puzzle(grid, rng, symmetric=False):
+    """
+    removes givens from a complete grid in random order, keeping every removal that leaves the solution unique,
+    and returns the puzzle; with symmetric, cells are removed together with their mirror through the center
+    on boards of BOUNDED_SIZE and up, a removal whose uniqueness check runs past UNIQUENESS_STEPS is undone, which
+    keeps large boards fast to generate at the price of a few givens more than strictly needed; smaller boards are
+    always checked to the end, so their puzzles are minimal
+    """
+    n = len(grid)
+    max_steps = UNIQUENESS_STEPS if n >= BOUNDED_SIZE else None
+    board = [row[:] for row in grid]
+    cells = [(r, c) for r in range(n) for c in range(n)]
+    rng.shuffle(cells)
+    for r, c in cells:
+        group = {(r, c), (n - 1 - r, n - 1 - c)} if symmetric else {(r, c)}
+        if any(not board[gr][gc] for gr, gc in group):
+            continue
+        saved = [board[gr][gc] for gr, gc in group]
+        for gr, gc in group:
+            board[gr][gc] = 0
+        try:
+            keep = not unique(board, max_steps)
+        except TimeoutError:
+            keep = True
+        if keep:
+            for (gr, gc), value in zip(group, saved):
+                board[gr][gc] = value
+    return board
+
+
+def _naked_singles(grid, used, n):
+    """fills cells with a single candidate pass after pass, returns the number of passes that placed something"""
+    cell_units, _ = bitmask.units(n)
+    full = (1 << n) - 1
+    passes = 0
+    while True:
+        placed = False
+        for i, v in enumerate(grid):
+            if v:
+                continue
+            r, c, b = cell_units[i]
+            candidates = full & ~(used[r] | used[n + c] | used[2 * n + b])
+            if candidates and not candidates & (candidates - 1):
+                bitmask._place(grid, used, cell_units, i, candidates.bit_length())
+                placed = True
+        if not placed:
+            return passes
+        passes += 1
+
+
+def rate(board):
+    """
+    Rates a puzzle with one solution by the techniques it needs and returns
+    {'difficulty', 'givens', 'technique', 'passes', 'decisions', 'backtracks'}: passes is how many rounds of naked
+    singles it takes before they run out (how deep the easy part goes), decisions and backtracks are what the
+    bitmask backend's search needs after naked and hidden singles.
+    >>> rate([[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 0, 0]])['difficulty']
+    'easy'
+    """
+    n = len(board)
+    cell_units, _ = bitmask.units(n)
+    grid = [0] * (n * n)
+    used = [0] * (3 * n)
+    for i, v in enumerate(v for row in board for v in row):
+        if v:
+            bitmask._place(grid, used, cell_units, i, v)
+    givens = sum(1 for v in grid if v)
+
+    passes = _naked_singles(grid, used, n)
+    stats = Stats()
+    bitmask.solve_board(board, stats=stats)
+    decisions, backtracks = stats.counters['decisions'], stats.counters['backtracks']
+    if all(grid):
+        technique, difficulty = 'naked singles', 'easy'
+    elif not decisions:
+        technique, difficulty = 'hidden singles', 'medium'
+    else:
+        technique = 'search'
+        difficulty = 'hard' if decisions <= HARD_DECISIONS else 'expert'
+    return {'difficulty': difficulty, 'givens': givens, 'technique': technique, 'passes': passes,
+            'decisions': decisions, 'backtracks': backtracks}
+
+
+def generate(index, n=9, seed=0, difficulty=None, symmetric=False):
+    """
+    Returns (board, rating) for puzzle number index of the run with the given seed. With a difficulty, puzzles are
+    generated until one gets that rating, raising RuntimeError if none of MAX_ATTEMPTS puzzles does.
+    >>> board, rating = generate(0, n=4, seed=1)
+    >>> unique(board), rating['difficulty'] in DIFFICULTIES
+    (True, True)
+    >>> generate(0, n=4, seed=1) == (board, rating)
+    True
+    """
+    if difficulty is not None and difficulty not in DIFFICULTIES:
+        raise ValueError(f"unknown difficulty {difficulty!r}, expected one of {DIFFICULTIES}")
+    for attempt in range(MAX_ATTEMPTS):
+        rng = random.Random(f"{seed}:{index}:{attempt}")
+        board = minimal_puzzle(solved_grid(n, rng), rng, symmetric)
+        rating = rate(board)
+        if difficulty is None or rating['difficulty'] == difficulty:
+            return board, rating
+    raise RuntimeError(f"no {difficulty} {n}x{n} puzzle among {MAX_ATTEMPTS} attempts for puzzle {index} of seed {seed}")
+
+
+def _generate(job):
+    return generate(*job)
+
+
+def generate_many(count, n=9, seed=0, difficulty=None, symmetric=False, workers=1, pool=None):
+    """
+    lazily yields (board, rating) for puzzles 0 .. count - 1 of a run, in order, in parallel if workers > 1:
+    across the given concurrent.futures pool, or else a process pool of that many workers started for the run
+    """
+    jobs = ((index, n, seed, difficulty, symmetric) for index in range(count))
+    if workers == 1:
+        yield from map(_generate, jobs)
+        return
+    chunksize = max(1, min(64, count // (4 * workers)))
+    if pool is not None:
+        yield from pool.map(_generate, jobs, chunksize=chunksize)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_generate, jobs, chunksize=chunksize)
+
+
+def board_json(board):
+    """formats a board the way the files in sudoku_boards/ are, one row per line"""
+    return '[\n' + ',\n'.join('    ' + json.dumps(row) for row in board) + '\n]\n'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="generate minimal puzzles with a unique solution")
+    parser.add_argument('count', type=int, help="number of puzzles")
+    parser.add_argument('-n', type=int, default=9, help="board size, a perfect square")
+    parser.add_argument('--difficulty', choices=DIFFICULTIES, help="only keep puzzles with this rating")
+    parser.add_argument('--seed', type=int, default=0, help="the same seed gives the same puzzles")
+    parser.add_argument('--symmetric', action='store_true', help="remove givens in pairs mirrored through the center")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="generator processes")
+    parser.add_argument('-f', '--format', choices=('lines', 'json'), default='lines',
+                        help="lines: one puzzle per line (see bulk.py); json: one board file per puzzle")
+    parser.add_argument('-o', '--output', default='-',
+                        help="file for --format lines ('-' for stdout), directory for --format json")
+    args = parser.parse_args()
+    if isqrt(args.n) ** 2 != args.n:
+        parser.error(f"board size {args.n} is not a perfect square")
+    if args.format == 'json' and args.output == '-':
+        parser.error("--format json needs an output directory")
+
+    ratings = Counter()
+    puzzles = generate_many(args.count, args.n, args.seed, args.difficulty, args.symmetric, args.workers)
+    out = sys.stdout if args.format == 'json' or args.output == '-' else open(args.output, 'w')
+    failure = None
+    with out:
+        try:
+            for index, (board, rating) in enumerate(puzzles):
+                ratings[rating['difficulty']] += 1
+                if args.format == 'lines':
+                    out.write(bulk.format_line(board) + '\n')
+                else:
+                    name = f"generated{args.n}_{rating['difficulty']}_{args.seed}_{index}.json"
+                    with open(os.path.join(args.output, name), 'w') as f:
+                        f.write(board_json(board))
+        except RuntimeError as e:
+            failure = e
+    print(', '.join(f"{ratings[d]} {d}" for d in DIFFICULTIES), file=sys.stderr)
+    if failure is not None:
+        print(f"stopped after {sum(ratings.values())} of {args.count} puzzles: {failure}", file=sys.stderr)
+        sys.exit(1)
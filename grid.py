@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Index tables for the cells, units and peers of a board, shared by every solver.
+
+Cells are numbered r * n + c. The tables of the common board sizes (SIZES) are built once, when the module is
+imported, so a solve never recomputes which box a cell is in or which cells it sees; any other perfect square size
+gets its tables on first use and keeps them from then on. Larger sizes are left out of SIZES on purpose: their
+tables take milliseconds to build, which every process importing a solver would pay, and a solve of a 16x16
+board dwarfs that anyway.
+"""
+
+from math import isqrt
+
+SIZES = (4, 9)  # board sizes whose tables are built at import
+
+
+class Table:
+    """
+    the index tables of one board size n:
+        cell_units      the (row, column, box) index triple of every cell
+        unit_cells      the cells of every row, then every column, then every box
+        peers           the other cells sharing a row, column or box with every cell, in order
+        sub_grid        the (sr, sc) coordinates of the box of every cell
+        sub_grid_cells  {(sr, sc): the (r, c) coordinates of that box's cells}
+    """
+
+    def __init__(self, n):
+        box = isqrt(n)
+        if box * box != n:
+            raise ValueError(f"board size {n} is not a perfect square")
+        self.n, self.box = n, box
+        self.cell_units = tuple((r, c, (r // box) * box + c // box) for r in range(n) for c in range(n))
+        rows = [tuple(r * n + c for c in range(n)) for r in range(n)]
+        columns = [tuple(r * n + c for r in range(n)) for c in range(n)]
+        boxes = [tuple(r * n + c
+                       for r in range(br * box, (br + 1) * box)
+                       for c in range(bc * box, (bc + 1) * box))
+                 for br in range(box) for bc in range(box)]
+        self.unit_cells = tuple(rows + columns + boxes)
+        self.peers = tuple(tuple(sorted({*rows[r], *columns[c], *boxes[b]} - {i}))
+                           for i, (r, c, b) in enumerate(self.cell_units))
+        self.sub_grid = tuple((r // box, c // box) for r, c, _ in self.cell_units)
+        self.sub_grid_cells = {(b // box, b % box): tuple(divmod(i, n) for i in cells) for b, cells in enumerate(boxes)}
+
+
+_tables = {n: Table(n) for n in SIZES}
+
+
+def table(n):
+    """
+    Returns the Table of board size n, raising ValueError if n is not a perfect square.
+    >>> t = table(4)
+    >>> t.cell_units[6], t.unit_cells[4], t.peers[0], t.sub_grid[6], t.sub_grid_cells[(1, 0)]
+    ((1, 2, 1), (0, 4, 8, 12), (1, 2, 3, 4, 5, 8, 12), (0, 1), ((2, 0), (2, 1), (3, 0), (3, 1)))
+    """
+    try:
+        return _tables[n]
+    except KeyError:
+        return _tables.setdefault(n, Table(n))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
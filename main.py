@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
-import sys
-import doctest
+from contextlib import nullcontext
 
-sys.setrecursionlimit(10_000)
+import sat
+import grid
+import preprocess
+from cnf import encode_formula, decode_model
 
 ### HELPER FUNCTIONS ###
  
@@ -54,12 +56,11 @@ def get_column(board, c):
 
 def convert_to_sub_grid(n, r, c):
     """
-    Given a cell's coordinates, return the equivalent coordinates of the cell's subgrid.
+    Given a cell's coordinates, return the equivalent coordinates of the cell's subgrid, from grid.py's tables.
+    >>> convert_to_sub_grid(9, 4, 8)
+    (1, 2)
     """
-
-    sqrt_n = int(n**(1/2))
-    sr, sc = int(r/sqrt_n), int(c/sqrt_n)
-    return (sr,sc)
+    return grid.table(n).sub_grid[r * n + c]
 
 
 def get_sub_grid(board, sr, sc):
@@ -74,9 +75,7 @@ def get_sub_grid(board, sr, sc):
     >>> [get_sub_grid(board, r,c) for r in range(2) for c in range(2)]
     [[2, 5, 6], [3, 4, 7, 8], [9, 10, 13, 14], [11, 12, 15, 16]]
     """
-    sqrt_n = int(len(board)**(1/2))
-    sub_rows, sub_columns = range(sr*sqrt_n, (sr+1)*sqrt_n), range(sc*sqrt_n, (sc+1)*sqrt_n)
-    return [board[r][c] for r in sub_rows for c in sub_columns if get_cell(board, r,c)]
+    return [board[r][c] for r, c in grid.table(len(board)).sub_grid_cells[(sr, sc)] if board[r][c]]
 
 
 def sub_grid_empty(board, sr, sc):
@@ -84,10 +83,7 @@ def sub_grid_empty(board, sr, sc):
     Given a board and a cell.
     Returns the the a tuple of the row and column index of other empty cells in the same grid as the given cell
     """
-    n = len(board)
-    sqrt_n = int(n**(1/2))
-    sub_rows, sub_columns = range(sr*sqrt_n, (sr+1)*sqrt_n), range(sc*sqrt_n, (sc+1)*sqrt_n)
-    return [(new_r, new_c) for new_r in sub_rows for new_c in sub_columns if not get_cell(board, new_r, new_c)]
+    return [(r, c) for r, c in grid.table(len(board)).sub_grid_cells[(sr, sc)] if not board[r][c]]
 
 def all_possible_pairs_rule(array, val, pair_bool):
     """
@@ -102,6 +98,73 @@ def all_possible_pairs_rule(array, val, pair_bool):
     return result
 
 
+AT_MOST_ONE_ENCODINGS = ('pairwise', 'sequential', 'commander', 'product')
+
+def at_most_one_rule(variables, encoding='pairwise', key=()):
+    """
+    Given a list of variables, returns a rule that at most one of them is True, using the given encoding:
+        'pairwise'    a clause per pair of variables, no auxiliary variables (quadratic)
+        'sequential'  Sinz's sequential counter, a running "one was already True" variable per position (linear)
+        'commander'   groups of 3 under a commander variable, recursing on the commanders (linear)
+        'product'     Chen's 2-product: variables on a grid, at most one row and one column (O(k + sqrt(k)) recursive)
+    Auxiliary variables are named ('aux', key, tag, i), so key must be unique per call within one formula.
+    Lists of at most 4 variables always use pairwise, which is smaller there.
+    >>> at_most_one_rule(['a', 'b', 'c'])
+    [[('a', False), ('b', False)], [('a', False), ('c', False)], [('b', False), ('c', False)]]
+    >>> len(at_most_one_rule(list(range(25)))), len(at_most_one_rule(list(range(25)), 'sequential', 'x'))
+    (300, 71)
+    >>> at_most_one_rule(['a', 'b', 'c'], 'bogus')
+    Traceback (most recent call last):
+    ...
+    ValueError: unknown at-most-one encoding 'bogus', expected one of ('pairwise', 'sequential', 'commander', 'product')
+    """
+    if encoding not in AT_MOST_ONE_ENCODINGS:
+        raise ValueError(f"unknown at-most-one encoding {encoding!r}, expected one of {AT_MOST_ONE_ENCODINGS}")
+    if len(variables) <= 4 or encoding == 'pairwise':
+        result = []
+        for i, main in enumerate(variables):
+            for other in variables[i+1:]:
+                result.append([(main, False), (other, False)])
+        return result
+
+    if encoding == 'sequential':
+        # s_i is True when one of variables[:i+1] is True
+        counters = [('aux', key, 's', i) for i in range(len(variables) - 1)]
+        result = [[(variables[0], False), (counters[0], True)]]
+        for i in range(1, len(variables) - 1):
+            result.append([(variables[i], False), (counters[i], True)])
+            result.append([(counters[i-1], False), (counters[i], True)])
+            result.append([(variables[i], False), (counters[i-1], False)])
+        result.append([(variables[-1], False), (counters[-1], False)])
+        return result
+
+    if encoding == 'commander':
+        result = []
+        commanders = []
+        for g in range(0, len(variables), 3):
+            group = variables[g:g+3]
+            commander = ('aux', key, 'c', g // 3)
+            commanders.append(commander)
+            result.extend(at_most_one_rule(group, 'pairwise'))
+            result.extend([(var, False), (commander, True)] for var in group)
+            result.append([(commander, False)] + [(var, True) for var in group])
+        return result + at_most_one_rule(commanders, 'commander', key + ('c',))
+
+    # 'product'
+    width = int(len(variables)**(1/2))
+    if width * width < len(variables):
+        width += 1
+    height = -(-len(variables) // width)
+    rows = [('aux', key, 'u', i) for i in range(height)]
+    columns = [('aux', key, 'v', j) for j in range(width)]
+    result = []
+    for k, var in enumerate(variables):
+        result.append([(var, False), (rows[k // width], True)])
+        result.append([(var, False), (columns[k % width], True)])
+    return (result + at_most_one_rule(rows, 'product', key + ('u',))
+            + at_most_one_rule(columns, 'product', key + ('v',)))
+
+
 
 # # Rules Helper Functions # #
 
@@ -145,9 +208,9 @@ def cell_must_be_filled_rule(board, cell):
     ...         [2,3,4,0],
     ...         ]
     >>> cell_must_be_filled_rule(board, (0,1))
-    [[(((0, 1), 4), True), (((0, 1), 5), True), (((0, 1), 6), True), (((0, 1), 7), True), (((0, 1), 8), True), (((0, 1), 9), True)]]
+    [[(((0, 1), 4), True)]]
     >>> cell_must_be_filled_rule(board, (3,3))
-    [[(((3, 3), 1), True), (((3, 3), 5), True), (((3, 3), 6), True), (((3, 3), 7), True), (((3, 3), 8), True), (((3, 3), 9), True)]]
+    [[(((3, 3), 1), True)]]
     """
     r, c = cell
     n = len(board)
@@ -165,13 +228,13 @@ def fill_cell_at_most_once(board, cell):
     Given a board and a cell coordinates. Returns rules such that for each empty cell is filled with at most one valid value.
     The rule is set up such that if any two different valid values are assinged to the same cell, the whole formula is false.
     >>> board = [
-    ...         [0,7,5,9],
-    ...         [3,6,1,8],
-    ...         [4,1,6,0],
-    ...         [2,3,4,0],
+    ...         [0,2,0,0],
+    ...         [0,0,0,0],
+    ...         [0,0,0,0],
+    ...         [3,0,0,0],
     ...         ]
-    >>> fill_cell_at_most_once(board, (0,0))   
-    [[(((0, 0), 1), False), (((0, 0), 8), False)]]
+    >>> fill_cell_at_most_once(board, (0,0))
+    [[(((0, 0), 1), False), (((0, 0), 4), False)]]
     """ 
     n = len(board)
     r,c = cell
@@ -202,7 +265,7 @@ def no_row_duplicates_rules(board, r):
     ...         ]
 
     >>> no_row_duplicates_rules(board, 0)
-    [[(((0, 0), 1), False), (((0, 1), 1), False)], [(((0, 0), 4), False), (((0, 1), 4), False)], [(((0, 0), 5), False), (((0, 1), 5), False)], [(((0, 0), 6), False), (((0, 1), 6), False)], [(((0, 0), 7), False), (((0, 1), 7), False)], [(((0, 0), 8), False), (((0, 1), 8), False)], [(((0, 0), 9), False), (((0, 1), 9), False)]]
+    [[(((0, 0), 1), False), (((0, 1), 1), False)], [(((0, 0), 4), False), (((0, 1), 4), False)]]
     >>> no_row_duplicates_rules(board, 1)
     []
     """
@@ -233,7 +296,7 @@ def no_column_duplicates_rules(board, c):
     >>> [no_column_duplicates_rules(board, c) for c in [0,1,2]]
     [[], [], []]
     >>> no_column_duplicates_rules(board, 3)
-    [[(((2, 3), 1), False), (((3, 3), 1), False)], [(((2, 3), 3), False), (((3, 3), 3), False)], [(((2, 3), 5), False), (((3, 3), 5), False)], [(((2, 3), 6), False), (((3, 3), 6), False)], [(((2, 3), 7), False), (((3, 3), 7), False)], [(((2, 3), 8), False), (((3, 3), 8), False)], [(((2, 3), 9), False), (((3, 3), 9), False)]]
+    [[(((2, 3), 1), False), (((3, 3), 1), False)], [(((2, 3), 3), False), (((3, 3), 3), False)]]
     """
     n = len(board)
     #all empty cells in same column
@@ -259,7 +322,7 @@ def no_grid_duplicates_rules(board, sr, sc):
     ...         [2,3,4,0],
     ...         ]
     >>> no_grid_duplicates_rules(board, *(1,1))
-    [[(((2, 3), 1), False), (((3, 3), 1), False)], [(((2, 3), 3), False), (((3, 3), 3), False)], [(((2, 3), 5), False), (((3, 3), 5), False)], [(((2, 3), 6), False), (((3, 3), 6), False)], [(((2, 3), 7), False), (((3, 3), 7), False)], [(((2, 3), 8), False), (((3, 3), 8), False)], [(((2, 3), 9), False), (((3, 3), 9), False)]]
+    [[(((2, 3), 1), False), (((3, 3), 1), False)], [(((2, 3), 3), False), (((3, 3), 3), False)]]
     >>> [no_grid_duplicates_rules(board, *cell) for cell in [(0,1), (1,0)]]
     [[], []]
     """
@@ -267,7 +330,7 @@ def no_grid_duplicates_rules(board, sr, sc):
     # all empty cells in same subgrid.
     all_empty_in_grid = sub_grid_empty(board, sr,sc)
     # all alowed vals from same grid
-    valid_subgrid_vals = [num for num in range(1, 10) if num not in set(get_sub_grid(board, sr,sc))]
+    valid_subgrid_vals = [num for num in range(1, n+1) if num not in set(get_sub_grid(board, sr,sc))]
     # for all allowed values, no val x can be true in both cells for any possible pair of all empty cells
 
     result = []
@@ -326,118 +389,165 @@ def reduce_formula(default_literal, formula):
 
 # # # MAIN # # #
 
-def sudoku_board_to_sat_formula(sudoku_board):
+def sudoku_clauses(sudoku_board, at_most_one='pairwise', candidates=None):
+    """
+    Lazily yields the clauses of the SAT formula for the given sudoku board.
+    Row, column and sub-grid occupancy is computed once up front, so only the genuinely open candidates of each
+    empty cell become variables and no taboo clauses are needed:
+        - every filled cell keeps its value: [((cell, val), True)]
+        - every empty cell takes at least one candidate and at most one candidate
+        - no candidate value is taken by two empty cells of the same row, column or sub-grid
+          (pairs already covered by a row or column rule are not repeated for the sub-grid)
+    Givens that clash with each other, or an empty cell without candidates, yield the empty clause.
+    at_most_one picks how the "at most one" rules are encoded, one of AT_MOST_ONE_ENCODINGS (see at_most_one_rule);
+    the encodings other than 'pairwise' add auxiliary variables to keep the clause count linear.
+    candidates, if given, maps empty cells (r, c) to the values still worth considering for them, e.g. what
+    preprocess.reduce_board has left; the values that clash with the givens are dropped from it all the same.
+    >>> board = [
+    ...         [1,0,3,0],
+    ...         [3,0,1,4],
+    ...         [4,1,2,3],
+    ...         [2,3,4,1],
+    ...         ]
+    >>> [clause for clause in sudoku_clauses(board) if len(clause) != 1 or not clause[0][1]]
+    [[(((0, 1), 2), True), (((0, 1), 4), True)], [(((0, 1), 2), False), (((0, 1), 4), False)], [(((0, 1), 2), False), (((0, 3), 2), False)], [(((0, 1), 2), False), (((1, 1), 2), False)]]
+    """
+    n = len(sudoku_board)
+    table = grid.table(n)  # raises ValueError unless n is a perfect square
+    sqrt_n, sub_grid = table.box, table.sub_grid
+    rows_used = [set() for _ in range(n)]
+    columns_used = [set() for _ in range(n)]
+    grids_used = [[set() for _ in range(sqrt_n)] for _ in range(sqrt_n)]
+
+    # givens: keep their values, and record the occupancy of every row, column and sub-grid once
+    for r in range(n):
+        for c in range(n):
+            val = get_cell(sudoku_board, r, c)
+            if not val:
+                continue
+            sr, sc = sub_grid[r * n + c]
+            if val in rows_used[r] or val in columns_used[c] or val in grids_used[sr][sc]:
+                yield []
+            rows_used[r].add(val)
+            columns_used[c].add(val)
+            grids_used[sr][sc].add(val)
+            yield get_filled_cell_rules(val, (r, c))[0]
+
+    # empty cells: at least one and at most one of their candidates
+    possible = candidates
+    candidates = {}
+    for r in range(n):
+        for c in range(n):
+            if get_cell(sudoku_board, r, c):
+                continue
+            sr, sc = sub_grid[r * n + c]
+            taboo_vals = rows_used[r] | columns_used[c] | grids_used[sr][sc]
+            cell = (r, c)
+            values = range(1, n+1) if possible is None else possible.get(cell, range(1, n+1))
+            allowed = [val for val in values if val not in taboo_vals]
+            candidates[cell] = allowed
+            yield [((cell, val), True) for val in allowed]
+            yield from at_most_one_rule([(cell, val) for val in allowed], at_most_one, ('cell', cell))
+
+    def unit_rules(cells, unit, same_line=False):
+        """at most one empty cell of the unit takes each value; same_line skips pairwise clauses sharing a row or column"""
+        holders = {}
+        for cell in cells:
+            for val in candidates.get(cell, ()):
+                holders.setdefault(val, []).append(cell)
+        for val, cells_with_val in holders.items():
+            if at_most_one != 'pairwise':
+                yield from at_most_one_rule([(cell, val) for cell in cells_with_val], at_most_one, unit + (val,))
+                continue
+            for i, main in enumerate(cells_with_val):
+                for other in cells_with_val[i+1:]:
+                    if same_line and (main[0] == other[0] or main[1] == other[1]):
+                        continue
+                    yield [((main, val), False), ((other, val), False)]
+
+    for r in range(n):
+        yield from unit_rules([(r, c) for c in range(n)], ('row', r))
+    for c in range(n):
+        yield from unit_rules([(r, c) for r in range(n)], ('column', c))
+    for (sr, sc), cells in table.sub_grid_cells.items():
+        yield from unit_rules(cells, ('grid', sr, sc), same_line=True)
+
+
+def sudoku_board_to_sat_formula(sudoku_board, at_most_one='pairwise'):
     """
     Generates a SAT formula that, when solved, represents a solution to the
     given sudoku board.  The result should be a formula of the right form to be
     passed to the satisfying_assignment function above.
+    The clauses come from sudoku_clauses; iterate over that directly to stream them instead.
+    at_most_one selects the at-most-one encoding: 'pairwise', 'sequential', 'commander' or 'product'.
     """
-    n = len(sudoku_board)
-    
-    def get_rules_for_all_rows(n):
-        """returns the rules for each all rows in board such that in a board, each valid number is assigned to at most one empty cell"""
-        rules = []
-        for r in range(n):
-            rules.extend(no_row_duplicates_rules(sudoku_board,r))
-        return rules
-
-    def get_rules_for_all_columns(n):
-        """returns rules for all columns such that in each column each valid number in assinged to at most one empty cell"""
-        rules = []
-        for c in range(n):
-            rules.extend(no_column_duplicates_rules(sudoku_board, c))
-        return rules
-    
-    def get_rules_for_all_sub_grids(n):
-        """returns rules for all grids such that in each sub grid, each valid number is assigned to at most one empty cell"""
-        sqrt_n = int(n**(1/2))
-        rules = []
-        
-        for sr in range(sqrt_n):
-            for sc in range(sqrt_n):
-                rules.extend(no_grid_duplicates_rules(sudoku_board, sr, sc))
-        return rules
-
-    def get_all_cell_rules(n):
-        """returns rules for every cell such that existing cells must maintain their values.
-            Empty cells must be filled with at least one value, filled with at most one value, 
-            and must not be filled up with recurring row,column,grid values"""
-        all_existing_cell_rules = []
-        all_empty_cell_rules = []
-
-        for r in range(n):
-            for c in range(n):
-                #if cell is already filled
-                if get_cell(sudoku_board, r, c):
-                    all_existing_cell_rules.extend(get_filled_cell_rules(get_cell(sudoku_board,r,c), (r, c)))  
-                else: #if cell is empty
-                    all_empty_cell_rules.extend(get_empty_cell_rules(sudoku_board, (r,c)))
-        return all_existing_cell_rules + all_empty_cell_rules
- 
+    return list(sudoku_clauses(sudoku_board, at_most_one))
 
-    all_cell_rules = get_all_cell_rules(n)
-    all_rows_rules = get_rules_for_all_rows(n)
-    all_columns_rules = get_rules_for_all_columns(n)
-    all_sub_grids_rules = get_rules_for_all_sub_grids(n)
 
-    ans = all_cell_rules + all_columns_rules + all_rows_rules + all_sub_grids_rules
-    return ans 
+def candidate_groups(variables):
+    """
+    Given the VariableMap a sudoku formula was encoded with, returns the integer variables grouped by cell:
+    one list per cell holding the numbers of all its ((r, c), val) variables.
+    Variables of any other shape are ignored. These are the groups the 'mrv' heuristic branches on.
+    >>> cnf, variables = encode_formula([[(((0, 0), 1), True), (((0, 1), 2), True), (((0, 0), 3), True)]])
+    >>> candidate_groups(variables)
+    [[1, 3], [2]]
+    """
+    groups = {}
+    for num in range(1, len(variables) + 1):
+        var = variables[num]
+        if isinstance(var, tuple) and len(var) == 2 and isinstance(var[0], tuple):
+            groups.setdefault(var[0], []).append(num)
+    return list(groups.values())
 
 
-def satisfying_assignment(formula):
+def satisfying_assignment(formula, mode='dpll', heuristic='first', deadline=None, stats=None, simplify=False):
     """
     Find a satisfying assignment for a given CNF formula.
     Returns that assignment if one exists, or None otherwise.
 
+    The tuple formula is numbered into an integer-literal CNF (see cnf.py) and searched by sat.solve;
+    the resulting model is mapped back to the original variables.
+    mode selects the search: 'dpll' (chronological backtracking) or 'cdcl' (clause learning with backjumping).
+    heuristic selects the branching rule: 'first', 'vsids', 'dlis' or 'mrv' (sudoku cell with fewest candidates).
+    If deadline (a time.time() value) passes while the formula is built, loaded or searched, TimeoutError is raised.
+    With simplify, the integer CNF goes through preprocess.simplify_cnf before the search.
+    If a profiling.Stats is given, it receives the formula size, the solver's counters and the time spent in
+    each phase: 'formula' (building and numbering the clauses), 'load' (setting up the solver), 'search' and 'decode'.
+
     >>> satisfying_assignment([])
     {}
     >>> x = satisfying_assignment([[('a', True), ('b', False), ('c', True)]])
     >>> x.get('a', None) is True or x.get('b', None) is False or x.get('c', None) is True
     True
-    """
-    
-    # base case : return an empty dictionary to populate with assignments as we backtrack
-    if not formula: 
-        return {}
-    else:
-        #loop through every clause to find length_1 clause and recurse on other variables and rules using the lenght-1 clause existing literal value.
-        for i, clause in enumerate(formula):
-            if len(clause) == 1:
-                #the length 1 clause literal variable is fixed to its value in the literal. Reduce formula and recurse on the rest of the varibles.
-                fixed_var, fixed_bool = clause[0]
-                reduced_formula = reduce_formula((fixed_var, fixed_bool), formula)
-                result = satisfying_assignment(reduced_formula)
-                
-                #if solution is found, return the result.
-                if result != None:
-                    #if solution is found but would contradict with already fixed variable, then no solution is possible.
-                    if result.get(fixed_var, fixed_bool) != fixed_bool: return None
-                    #otherwise use current assignment
-                    result[fixed_var] = fixed_bool
-                    return result
-                return None
-
-        #if no length-1 clause exists, choose any var  and fix and recurse on its two possible values i.e both True  and False.
-        #return whichever gives a solution. #note that formula is not mutated at this point.
-        #path 1
-        fixed_var, fixed_bool = formula[0][0]
-        with_fixed_bool = reduce_formula((fixed_var, fixed_bool), formula)
-        result = satisfying_assignment(with_fixed_bool)
-        if result != None:
-            if result.get(fixed_var,fixed_bool) != fixed_bool: return None
-            result[fixed_var] = fixed_bool
-            return result
-        
-
-        #Path 2
-        with_not_fixed_bool = reduce_formula((fixed_var, not fixed_bool), formula)
-        result = satisfying_assignment(with_not_fixed_bool)           
-        if result != None:
-            if result.get(fixed_var, not fixed_bool) == fixed_bool: return None
-            result[fixed_var] = not fixed_bool
-            return result
-        #if neither paths returns solution then no solution really exists. 
-    return None
+    >>> satisfying_assignment([[('a', True)], [('a', False), ('b', True)]], mode='cdcl')
+    {'a': True, 'b': True}
+    """
+    timed = stats.phase if stats is not None else lambda name: nullcontext()
+    with timed('formula'):
+        int_formula, variables = encode_formula(formula, deadline=deadline)
+    if simplify:
+        if stats is not None:
+            stats.update({'encoded_clauses': len(int_formula)})
+        int_formula = preprocess.simplify_cnf(int_formula, deadline, stats)
+        if int_formula is None:
+            return None
+    with timed('load'):
+        groups = candidate_groups(variables) if heuristic == 'mrv' else None
+        search = sat.Solver(int_formula, mode, heuristic, groups, deadline)
+    if stats is not None:
+        stats.update({'variables': int_formula.num_vars, 'clauses': len(int_formula)})
+        search.progress = lambda solver: stats.progress(solver.counters())
+    try:
+        with timed('search'):
+            satisfiable = search.solve(deadline)
+    finally:
+        if stats is not None:
+            stats.update(search.counters())
+    if not satisfiable:
+        return None
+    with timed('decode'):
+        return decode_model(search.model(), variables)
 
 
 def assignments_to_sudoku_board(assignments, n):
@@ -457,13 +567,32 @@ def assignments_to_sudoku_board(assignments, n):
     tot = int(n*n) #counter for all keys with value True i.e (cell,val) : True -> board[cell] = val
 
     for var in assignments:
-        if not assignments[var]: continue
+        if not assignments[var] or var[0] == 'aux': continue #auxiliary variables of the at-most-one encodings
         new_board[var[0][0]][var[0][1]] = var[1]
         tot -= 1
     
     return new_board if tot == 0 else None #the board is valid iff all cells are filled.
 
 
+def sudoku_solutions(sudoku_board, mode='dpll', heuristic='first', at_most_one='pairwise', deadline=None):
+    """
+    Lazily yields every solution of an n-by-n board as a list of lists.
+    One solver is kept for the whole enumeration: each solution found is ruled out by a clause over the cell
+    variables and the search resumes with what it has learned (see sat.models). The at-most-one encodings'
+    auxiliary variables are left out of those clauses, since they can differ between two models of the same board.
+    >>> len(list(sudoku_solutions([[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]])))
+    18
+    >>> len(list(sudoku_solutions([[0] * 4 for _ in range(4)], mode='cdcl', at_most_one='sequential')))
+    288
+    """
+    n = len(sudoku_board)
+    int_formula, variables = encode_formula(sudoku_clauses(sudoku_board, at_most_one), deadline=deadline)
+    groups = candidate_groups(variables) if heuristic == 'mrv' else None
+    cells = [number for number, var in enumerate(variables.names) if var is not None and var[0] != 'aux']
+    for model in sat.models(int_formula, mode, heuristic, groups, deadline, block=cells):
+        yield assignments_to_sudoku_board(decode_model(model, variables), n)
+
+
 if __name__ == "__main__":
     import doctest
     if False:
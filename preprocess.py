@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Preprocessing that shrinks a puzzle before the SAT search sees it, or solves it outright.
+
+Two stages, each usable on its own:
+    reduce_board  works on the board's candidates (bitmasks as in bitmask.py) with the techniques a player uses:
+                  naked and hidden singles, locked candidates (pointing and claiming) and naked pairs
+    simplify_cnf  works on any integer CNF: level-0 unit propagation, failed-literal probing and subsumption
+
+Most puzzles fall to the first stage alone. For the rest, the formula is built from the reduced board and its
+remaining candidates only (see main.sudoku_clauses), so it is smaller before the second stage even starts.
+Symmetric variants of a puzzle are not handled here; the solution cache already maps them onto each other.
+"""
+
+import time
+from contextlib import nullcontext
+
+import sat
+import grid
+from cnf import CNF
+
+PROBE_LIMIT = 4000  # literals failed-literal probing tries, at most, so huge formulas stay quick to simplify
+
+
+class Contradiction(Exception):
+    """the board has no solution"""
+
+
+class _Candidates:
+    """the values placed so far and the candidates left for every empty cell of one board"""
+
+    def __init__(self, board, deadline=None):
+        n = len(board)
+        self.deadline = deadline  # time.time() value after which the techniques raise TimeoutError
+        self.n = n
+        t = grid.table(n)
+        self.cell_units, self.unit_cells, self.peers = t.cell_units, t.unit_cells, t.peers
+        self.full = (1 << n) - 1
+        self.grid = [0] * (n * n)
+        self.cand = [self.full] * (n * n)
+        self.counts = {'naked_singles': 0, 'hidden_singles': 0, 'locked_candidates': 0, 'naked_pairs': 0}
+        for i, v in enumerate(v for row in board for v in row):
+            if v:
+                if not self.cand[i] >> (v - 1) & 1:
+                    raise Contradiction(f"the givens clash at cell {divmod(i, n)}")
+                self.place(i, v)
+
+    def check_clock(self):
+        if self.deadline is not None and time.time() > self.deadline:
+            raise TimeoutError("solver deadline exceeded")
+
+    def place(self, i, v):
+        bit = 1 << (v - 1)
+        values, cand = self.grid, self.cand
+        values[i] = v
+        cand[i] = 0
+        for j in self.peers[i]:
+            cand[j] &= ~bit
+
+    def eliminate(self, cells, bits):
+        """removes bits from the candidates of the given cells, returns how many candidates went"""
+        cand = self.cand
+        removed = 0
+        for i in cells:
+            if cand[i] & bits:
+                removed += bin(cand[i] & bits).count('1')
+                cand[i] &= ~bits
+        return removed
+
+    def singles(self):
+        """places naked and hidden singles until there are none left, returns whether anything was placed
+        the rules are those of bitmask._propagate and vectorized.propagate, which work from the values placed
+        alone; here they read self.cand, which locked candidates and naked pairs narrow further"""
+        values, cand, full = self.grid, self.cand, self.full
+        placed = False
+        while True:
+            self.check_clock()
+            changed = False
+            for i, c in enumerate(cand):
+                if values[i]:
+                    continue
+                if not c:
+                    raise Contradiction(f"cell {divmod(i, self.n)} has no candidate left")
+                if not c & (c - 1):
+                    self.place(i, c.bit_length())
+                    self.counts['naked_singles'] += 1
+                    changed = True
+            for cells in self.unit_cells:
+                once = twice = filled = 0
+                for i in cells:
+                    if values[i]:
+                        filled |= 1 << (values[i] - 1)
+                    else:
+                        twice |= once & cand[i]
+                        once |= cand[i]
+                if full & ~filled & ~once:
+                    raise Contradiction("a value has no place left in a unit")
+                singles = once & ~twice
+                while singles:
+                    bit = singles & -singles
+                    singles ^= bit
+                    for i in cells:
+                        if not values[i] and cand[i] & bit:
+                            self.place(i, bit.bit_length())
+                            self.counts['hidden_singles'] += 1
+                            changed = True
+                            break
+                    else:
+                        raise Contradiction("a value has no place left in a unit")
+            if not changed:
+                return placed
+            placed = True
+
+    def locked_candidates(self):
+        """
+        pointing: a value whose candidates in a box all lie on one row (column) is removed from the rest of that line;
+        claiming: a value whose candidates on a line all lie in one box is removed from the rest of that box
+        returns how many candidates were removed
+        """
+        n, cand, cell_units, unit_cells = self.n, self.cand, self.cell_units, self.unit_cells
+        removed = 0
+        for u, cells in enumerate(unit_cells):
+            kind = u // n  # 0 row, 1 column, 2 box
+            values = 0
+            for i in cells:
+                values |= cand[i]
+            while values:
+                bit = values & -values
+                values ^= bit
+                holders = [i for i in cells if cand[i] & bit]
+                if len(holders) < 2:
+                    continue
+                if kind == 2:
+                    for line in (0, 1):
+                        lines = {cell_units[i][line] for i in holders}
+                        if len(lines) == 1:
+                            others = [i for i in unit_cells[line * n + lines.pop()] if cell_units[i][2] != u - 2 * n]
+                            removed += self.eliminate(others, bit)
+                else:
+                    boxes = {cell_units[i][2] for i in holders}
+                    if len(boxes) == 1:
+                        others = [i for i in unit_cells[2 * n + boxes.pop()] if cell_units[i][kind] != u - kind * n]
+                        removed += self.eliminate(others, bit)
+        self.counts['locked_candidates'] += removed
+        return removed
+
+    def naked_pairs(self):
+        """two cells of a unit left with the same two candidates take both values, so no other cell of the unit can;
+        returns how many candidates were removed"""
+        cand = self.cand
+        removed = 0
+        for cells in self.unit_cells:
+            pairs = {}
+            for i in cells:
+                c = cand[i]
+                if c and bin(c).count('1') == 2:
+                    pairs.setdefault(c, []).append(i)
+            for bits, holders in pairs.items():
+                if len(holders) == 2:
+                    removed += self.eliminate([i for i in cells if i not in holders], bits)
+        self.counts['naked_pairs'] += removed
+        return removed
+
+
+def reduce_board(board, stats=None, deadline=None):
+    """
+    Applies naked and hidden singles, locked candidates and naked pairs to a board until none of them changes
+    anything. Returns (board, candidates): a copy of the board with every value they placed, and the values still
+    possible for each of its empty cells as {(r, c): [values]}; or None if they prove the board has no solution.
+    If a profiling.Stats is given, it receives the time spent in each technique and how many values each placed
+    (singles) or candidates each removed (locked candidates, naked pairs).
+    Raises TimeoutError if it is still running at deadline (a time.time() value).
+    >>> board, candidates = reduce_board([[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]])
+    >>> board, candidates
+    ([[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]], {})
+    >>> reduce_board([[1, 0, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0], [0, 1, 0, 0]]) is None
+    False
+    >>> reduce_board([[1, 2, 3, 0], [0, 0, 0, 4], [0, 0, 0, 0], [0, 0, 0, 0]]) is None
+    True
+    """
+    timed = stats.phase if stats is not None else lambda name: nullcontext()
+    state = None
+    try:
+        with timed('singles'):
+            state = _Candidates(board, deadline)
+            state.singles()
+        while not all(state.grid):
+            state.check_clock()
+            with timed('locked_candidates'):
+                changed = state.locked_candidates()
+            if not changed:
+                with timed('naked_pairs'):
+                    changed = state.naked_pairs()
+            if not changed:
+                break
+            with timed('singles'):
+                state.singles()
+    except Contradiction:
+        return None
+    finally:
+        if stats is not None and state is not None:
+            stats.update(state.counts)
+    n = state.n
+    reduced = [state.grid[r * n:(r + 1) * n] for r in range(n)]
+    candidates = {divmod(i, n): [v for v in range(1, n + 1) if c >> (v - 1) & 1]
+                  for i, c in enumerate(state.cand) if not state.grid[i]}
+    return reduced, candidates
+
+
+def _subsume(clauses, deadline=None):
+    """drops every clause that contains all the literals of another (shorter or equal, earlier) clause"""
+    counts = {}
+    for clause in clauses:
+        for lit in clause:
+            counts[lit] = counts.get(lit, 0) + 1
+    order = sorted(range(len(clauses)), key=lambda k: len(clauses[k]))
+    # every kept clause is indexed under its rarest literal only: a clause subsuming another one contains that
+    # literal too, so looking under each literal of a clause still finds all its subsumers, and the lists stay short
+    watched = {}
+    kept = []
+    for count, k in enumerate(order):
+        if deadline is not None and not count % sat.CLOCK_INTERVAL and time.time() > deadline:
+            raise TimeoutError("solver deadline exceeded")
+        clause = clauses[k]
+        if any(clauses[j] <= clause for lit in clause for j in watched.get(lit, ())):
+            continue
+        kept.append(k)
+        watched.setdefault(min(clause, key=counts.get), []).append(k)
+    return [clauses[k] for k in sorted(kept)]
+
+
+def simplify_cnf(cnf, deadline=None, stats=None, probe_limit=PROBE_LIMIT):
+    """
+    Returns an equivalent, smaller CNF, or None if it finds the formula unsatisfiable:
+        - literals fixed by unit propagation become unit clauses, satisfied clauses go and false literals are cut
+        - failed-literal probing: if assuming a literal propagates to a conflict, its negation is fixed
+        - subsumption: a clause containing every literal of another clause is redundant
+    Variables keep their numbers, so models of the result are models of the input.
+    If a profiling.Stats is given, it receives the 'probing' and 'subsumption' times and the 'fixed_literals',
+    'failed_literals' and 'subsumed_clauses' counts.
+    >>> cnf = CNF()
+    >>> for clause in ([1, 2], [1, 2, 3], [-1, 4], [-1, -4], [2, -3, 5]):
+    ...     cnf.add_clause(clause)
+    >>> [list(clause) for clause in simplify_cnf(cnf)]
+    [[2], [-1]]
+    """
+    timed = stats.phase if stats is not None else lambda name: nullcontext()
+    failed = 0
+    with timed('probing'):
+        search = sat.Solver(cnf, deadline=deadline)
+        if not search.propagate_units():
+            return None
+        values = search.values
+        # only literals with a binary clause against them imply anything right away, so only those are probed
+        probes = [-lit for clause in cnf if len(clause) == 2 for lit in clause]
+        for lit in list(dict.fromkeys(probes))[:probe_limit]:
+            if values[lit]:
+                continue
+            if search.probe(lit) is None:
+                failed += 1
+                if search.unsat:
+                    return None
+        fixed = search.fixed()
+        clauses = []
+        for clause in cnf:
+            if any(values[lit] == 1 for lit in clause):
+                continue
+            clause = frozenset(lit for lit in clause if not values[lit])
+            if not clause:
+                return None
+            clauses.append(clause)
+    with timed('subsumption'):
+        kept = _subsume(clauses, deadline)
+    if stats is not None:
+        stats.update({'fixed_literals': len(fixed), 'failed_literals': failed,
+                      'subsumed_clauses': len(clauses) - len(kept)})
+    simplified = CNF(cnf.num_vars)
+    for lit in fixed:
+        simplified.add_clause([lit])
+    for clause in kept:
+        simplified.add_clause(sorted(clause, key=abs))
+    return simplified
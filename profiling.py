@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Opt-in instrumentation for a solve: search counters and phase timers collected in one Stats object that the
+backends fill in when they are given one, plus a hook that is called as the solve goes along.
+
+Without a Stats object the backends skip all of this. With one, the cost is a clock read per phase, a dict
+update when the search ends, and a hook call every few hundred decisions, so it can stay on in production.
+"""
+
+from time import perf_counter
+from contextlib import contextmanager
+
+
+class Stats:
+    """
+    Counters and phase timers of one solve.
+    hook, if given, is called as hook(event, stats) at the end of every phase (event is the phase name) and
+    periodically during the search (event is 'progress'), e.g. to log or to abort a solve that looks hopeless.
+    >>> stats = Stats()
+    >>> with stats.phase('search'):
+    ...     stats.update({'decisions': 3})
+    >>> stats.counters, list(stats.phases)
+    ({'decisions': 3}, ['search'])
+    """
+
+    def __init__(self, hook=None):
+        self.counters = {}
+        self.phases = {}  # phase name -> seconds, in the order the phases first ran
+        self.hook = hook
+
+    @contextmanager
+    def phase(self, name):
+        """times the body of a with statement as the given phase, adding up if the phase runs several times"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + perf_counter() - start
+            if self.hook is not None:
+                self.hook(name, self)
+
+    def update(self, counters):
+        """sets the given counters to their latest values"""
+        self.counters.update(counters)
+
+    def progress(self, counters):
+        """sets the given counters and reports them to the hook while the search is still running"""
+        self.counters.update(counters)
+        if self.hook is not None:
+            self.hook('progress', self)
+
+    def as_dict(self):
+        """returns the counters and phase times as a JSON-ready dict"""
+        return {'counters': dict(self.counters), 'phases': dict(self.phases), 'seconds': sum(self.phases.values())}
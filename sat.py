@@ -0,0 +1,602 @@
+#!/usr/bin/env python3
+"""
+SAT search over the integer-literal CNF formulas defined in cnf.py.
+
+Unit propagation uses two watched literals per clause: the first two literals of every clause are
+its watches, and assigning a literal only visits the clauses watching its negation. Every
+assignment is pushed on a trail, so backtracking just pops the trail back to a mark instead of
+copying the formula.
+
+Two search modes share that propagation engine:
+    'dpll'  chronological backtracking, flipping the most recent untried decision on conflict.
+    'cdcl'  conflict-driven clause learning: 1-UIP learned clauses, non-chronological backjumping,
+            Luby restarts and periodic deletion of learned clauses with a high LBD.
+
+and every search mode branches with one of the heuristics selected by name:
+    'first'  first unassigned variable, tried with the polarity it first appears with.
+    'vsids'  variable with the highest conflict activity (bumped on every conflict, decayed over time).
+    'dlis'   literal occurring in the most not-yet-satisfied clauses.
+    'mrv'    candidate group (e.g. a sudoku cell) with the fewest remaining candidates; groups are
+             supplied by the caller, and without them this falls back to 'first'.
+"""
+
+import time
+from array import array
+from heapq import heapify, heappop, heappush
+
+MODES = ('dpll', 'cdcl')
+HEURISTICS = ('first', 'vsids', 'dlis', 'mrv')
+
+RESTART_BASE = 100  # conflicts per unit of the Luby restart sequence
+PROGRESS_INTERVAL = 128  # decisions between two calls of the progress callback
+CLOCK_INTERVAL = 256  # clauses loaded or scanned, or literals propagated, between two looks at the clock
+ACTIVITY_DECAY = 0.95  # VSIDS: the bump increment grows by 1 / ACTIVITY_DECAY after every conflict
+
+
+def luby(i):
+    """
+    Returns the i-th element (1-based) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ...
+    >>> [luby(i) for i in range(1, 16)]
+    [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+    """
+    size, power = 1, 1
+    while size < i:
+        size, power = 2 * size + 1, 2 * power
+    while size != i:
+        size //= 2
+        power //= 2
+        if i > size:
+            i -= size
+    return power
+
+
+class Solver:
+    """
+    Search state for one CNF formula.
+    Literals are used directly as list indices: a negative literal -v indexes from the end, so
+    lists of size 2 * num_vars + 1 hold one slot per literal without any offset arithmetic.
+    """
+
+    def __init__(self, cnf, mode='dpll', heuristic='first', groups=None, deadline=None):
+        if mode not in MODES:
+            raise ValueError(f"unknown solver mode {mode!r}, expected one of {MODES}")
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"unknown branching heuristic {heuristic!r}, expected one of {HEURISTICS}")
+        n = cnf.num_vars
+        self.mode = mode
+        self.heuristic = heuristic
+        self._pick_branch = getattr(self, '_pick_' + heuristic)
+        self.groups = [list(group) for group in groups] if groups else []  # candidate variables per group, for 'mrv'
+        self.decisions = 0
+        self.propagations = 0  # literals implied by unit propagation
+        self.visited = 0  # trail literals whose watches propagation went through, to space out the clock checks
+        self.conflicts = 0
+        self.backtracks = 0  # times the search undid decision levels, restarts included
+        self.restarts = 0
+        self.clause_copies = 0  # clauses copied into the clause store, when loading and when compacting it
+        self.deadline = deadline  # time.time() value after which loading and solving raise TimeoutError
+        self.progress = None  # called with the solver every PROGRESS_INTERVAL decisions
+        self.assumptions = ()  # literals the current solve decides first and never flips
+        self.num_vars = n
+        self.values = array('b', bytes(2 * n + 1))  # values[lit] is 1 if lit is True, -1 if False, 0 if unassigned
+        self.level = array('i', [0]) * (n + 1)  # decision level each variable was assigned at
+        self.reason = array('i', [-1]) * (n + 1)  # clause that implied each variable, -1 for decisions
+        self.watches = [[] for _ in range(2 * n + 1)]  # watches[lit] lists the clauses watching lit
+        self.lits = []  # all clause literals back to back; a clause's first two slots are its watches
+        self.starts = [0]
+        self.lbd = []  # per clause: 0 for problem clauses, the literal block distance for learned ones
+        self.num_learned = 0
+        self.trail = []
+        self.trail_lim = []  # trail mark where each decision level starts
+        self.head = 0  # trail[:head] has already been propagated
+        self.unsat = False
+        self.phase = array('b', b'\x01' * (n + 1))  # polarity each variable is first tried with
+        self.activity = [0.0] * (n + 1)  # VSIDS scores
+        self.bump_inc = 1.0
+        self.heap = None  # VSIDS order: (-activity, var) entries, lazily cleaned
+        if heuristic == 'vsids':
+            self.heap = [(-0.0, var) for var in range(1, n + 1)]
+
+        seen = array('b', bytes(n + 1))
+        for lit in cnf.literals:
+            if not seen[abs(lit)]:
+                seen[abs(lit)] = 1
+                self.phase[abs(lit)] = 1 if lit > 0 else -1
+
+        units = []
+        for count, clause in enumerate(cnf):
+            if deadline is not None and not count % CLOCK_INTERVAL:
+                self._check_clock()
+            clause = list(dict.fromkeys(clause))
+            if len(set(map(abs, clause))) < len(clause):
+                continue  # contains both v and -v, always satisfied
+            if not clause:
+                self.unsat = True
+            elif len(clause) == 1:
+                units.append(clause[0])
+            else:
+                self._attach(clause)
+        self.clause_copies = len(self.lbd)
+        for lit in units:
+            if self.values[lit] == -1:
+                self.unsat = True
+            elif not self.values[lit]:
+                self._assign(lit)
+
+    def _check_clock(self):
+        """Raises TimeoutError if the deadline has passed."""
+        if self.deadline is not None and time.time() > self.deadline:
+            raise TimeoutError("solver deadline exceeded")
+
+    def _attach(self, clause, lbd=0):
+        """Stores a clause of at least two literals and watches its first two."""
+        index = len(self.starts) - 1
+        self.lits.extend(clause)
+        self.starts.append(len(self.lits))
+        self.lbd.append(lbd)
+        if lbd:
+            self.num_learned += 1
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    def _assign(self, lit, reason=-1):
+        values = self.values
+        values[lit] = 1
+        values[-lit] = -1
+        var = abs(lit)
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def _decide(self, lit):
+        """Opens a new decision level and assigns lit on it."""
+        self.decisions += 1
+        self._check_clock()
+        if self.progress is not None and not self.decisions % PROGRESS_INTERVAL:
+            self.progress(self)
+        self.trail_lim.append(len(self.trail))
+        self._assign(lit)
+
+    def _backtrack(self, level):
+        """Unassigns every literal above the given decision level."""
+        if len(self.trail_lim) <= level:
+            return
+        self.backtracks += 1
+        values, trail, heap, activity = self.values, self.trail, self.heap, self.activity
+        mark = self.trail_lim[level]
+        while len(trail) > mark:
+            lit = trail.pop()
+            values[lit] = values[-lit] = 0
+            if heap is not None:
+                heappush(heap, (-activity[abs(lit)], abs(lit)))
+        del self.trail_lim[level:]
+        self.head = min(self.head, mark)
+
+    def _propagate(self):
+        """
+        Assigns every literal implied by unit clauses.
+        Returns the index of a falsified clause on conflict, or None once a fixpoint is reached.
+        An implied literal is always moved to its reason clause's first slot.
+        """
+        lits, starts, values, watches, trail = self.lits, self.starts, self.values, self.watches, self.trail
+        timed = self.deadline is not None
+        # counted apart from head, which backtracking moves back, so the checks come at a steady pace
+        visited = self.visited
+        while self.head < len(trail):
+            false_lit = -trail[self.head]
+            self.head += 1
+            visited += 1
+            if timed and not visited % CLOCK_INTERVAL:
+                self.visited = visited
+                self._check_clock()
+            watching = watches[false_lit]
+            keep = []
+            for position, index in enumerate(watching):
+                start, end = starts[index], starts[index + 1]
+                # keep the falsified watch in the second slot
+                if lits[start] == false_lit:
+                    lits[start], lits[start + 1] = lits[start + 1], false_lit
+                first = lits[start]
+                if values[first] == 1:
+                    keep.append(index)
+                    continue
+                # look for a replacement watch that is not False
+                for k in range(start + 2, end):
+                    lit = lits[k]
+                    if values[lit] != -1:
+                        lits[start + 1], lits[k] = lit, false_lit
+                        watches[lit].append(index)
+                        break
+                else:
+                    keep.append(index)
+                    if values[first] == -1:
+                        keep.extend(watching[position + 1:])
+                        watches[false_lit] = keep
+                        self.visited = visited
+                        return index
+                    self.propagations += 1
+                    self._assign(first, index)
+            watches[false_lit] = keep
+        self.visited = visited
+        return None
+
+    def _next_assumption(self):
+        """Returns the first assumption that is not True yet (False ones included), or None once they all hold."""
+        values = self.values
+        for lit in self.assumptions:
+            if values[lit] != 1:
+                return lit
+        return None
+
+    def _pick_first(self):
+        """
+        Returns the first unassigned variable as a literal with the polarity it first appears with in the
+        formula, or None if every variable is assigned.
+        """
+        values = self.values
+        for var in range(1, self.num_vars + 1):
+            if not values[var]:
+                return var * self.phase[var]
+        return None
+
+    def _pick_vsids(self):
+        """Returns the unassigned variable with the highest activity, skipping stale heap entries."""
+        heap, values, activity = self.heap, self.values, self.activity
+        while heap:
+            score, var = heap[0]
+            if values[var] or -score != activity[var]:
+                heappop(heap)
+                continue
+            return var * self.phase[var]
+        return None
+
+    def _pick_dlis(self):
+        """Returns the unassigned literal that occurs in the largest number of not-yet-satisfied clauses."""
+        lits, starts, values = self.lits, self.starts, self.values
+        timed = self.deadline is not None
+        counts = {}
+        for i in range(len(starts) - 1):
+            if timed and not i % CLOCK_INTERVAL:
+                self._check_clock()
+            clause = lits[starts[i]:starts[i + 1]]
+            if any(values[lit] == 1 for lit in clause):
+                continue
+            for lit in clause:
+                if not values[lit]:
+                    counts[lit] = counts.get(lit, 0) + 1
+        if not counts:
+            return self._pick_first()
+        return max(counts, key=counts.get)
+
+    def _pick_mrv(self):
+        """
+        Returns the first open candidate of the group with the fewest open candidates, as a positive literal.
+        A group is skipped once one of its variables is True; with no open group this falls back to 'first'.
+        """
+        values = self.values
+        best, best_size = None, None
+        for group in self.groups:
+            size = 0
+            for var in group:
+                value = values[var]
+                if value == 1:
+                    break
+                if not value:
+                    size += 1
+            else:
+                if size and (best_size is None or size < best_size):
+                    best, best_size = group, size
+                    if size == 1:
+                        break
+        if best is None:
+            return self._pick_first()
+        return next(var for var in best if not values[var])
+
+    def _bump(self, var):
+        """Raises a variable's VSIDS activity, rescaling every score before they overflow."""
+        activity = self.activity
+        activity[var] += self.bump_inc
+        if activity[var] > 1e100:
+            self.activity = activity = [score * 1e-100 for score in activity]
+            self.bump_inc *= 1e-100
+            self.heap = [(-activity[var], var) for var in range(1, self.num_vars + 1) if not self.values[var]]
+            heapify(self.heap)
+        elif not self.values[var]:
+            heappush(self.heap, (-activity[var], var))
+
+    def _on_conflict(self, variables):
+        """Counts a conflict and, for VSIDS, bumps the variables involved in it and decays older scores."""
+        self.conflicts += 1
+        if self.heap is not None:
+            for var in variables:
+                self._bump(var)
+            self.bump_inc /= ACTIVITY_DECAY
+
+    def _dpll(self):
+        """
+        Iterative DPLL: propagates, branches on _pick_branch and, on conflict, backtracks to the most
+        recent decision whose other value has not been tried yet.
+        flipped holds one flag per decision level, so memory stays proportional to the number of variables.
+        """
+        flipped = []
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                if not self.trail_lim:
+                    self.unsat = True  # a conflict without decisions: the clauses alone are unsatisfiable
+                    return False
+                starts = self.starts
+                self._on_conflict({abs(lit) for lit in self.lits[starts[conflict]:starts[conflict + 1]]})
+                while self.trail_lim:
+                    lit = self.trail[self.trail_lim[-1]]
+                    self._backtrack(len(self.trail_lim) - 1)
+                    if not flipped.pop():
+                        flipped.append(True)
+                        self._decide(-lit)
+                        break
+                else:
+                    return False
+                continue
+            lit = self._next_assumption() if self.assumptions else None
+            if lit is not None:
+                if self.values[lit] == -1:
+                    return False  # the assumptions decided so far imply its negation
+                flipped.append(True)  # an assumption is never flipped
+                self._decide(lit)
+                continue
+            lit = self._pick_branch()
+            if lit is None:
+                return True
+            flipped.append(False)
+            self._decide(lit)
+
+    def _analyze(self, conflict):
+        """
+        Derives the first-UIP clause from a conflicting clause.
+        Returns (learned clause, backjump level); the clause's first literal is the one it asserts after
+        backjumping and its second literal, if any, comes from the backjump level.
+        """
+        lits, starts, level, reason, trail = self.lits, self.starts, self.level, self.reason, self.trail
+        current = len(self.trail_lim)
+        seen = set()
+        learned = [0]
+        pending = 0  # literals of the current level still to be resolved away
+        index = len(trail) - 1
+        lit = 0
+        clause = conflict
+        while True:
+            for other in lits[starts[clause]:starts[clause + 1]]:
+                var = abs(other)
+                if other == lit or var in seen or not level[var]:
+                    continue
+                seen.add(var)
+                if level[var] == current:
+                    pending += 1
+                else:
+                    learned.append(other)
+            while abs(trail[index]) not in seen:
+                index -= 1
+            lit = trail[index]
+            index -= 1
+            pending -= 1
+            if not pending:
+                break
+            clause = reason[abs(lit)]
+        learned[0] = -lit
+        self._on_conflict(seen)
+
+        if len(learned) == 1:
+            return learned, 0
+        deepest = max(range(1, len(learned)), key=lambda i: level[abs(learned[i])])
+        learned[1], learned[deepest] = learned[deepest], learned[1]
+        return learned, level[abs(learned[1])]
+
+    def _reduce_learned(self):
+        """
+        Deletes the worse half of the learned clauses (highest LBD first), keeping clauses that are the
+        reason for a current assignment, then compacts the clause store and rebuilds the watch lists.
+        """
+        lits, starts, lbd, reason, values = self.lits, self.starts, self.lbd, self.reason, self.values
+        locked = {reason[abs(lit)] for lit in self.trail}
+        candidates = [i for i, score in enumerate(lbd) if score > 2 and i not in locked]
+        candidates.sort(key=lambda i: (lbd[i], starts[i + 1] - starts[i]))
+        deleted = set(candidates[len(candidates) // 2:])
+
+        new_lits, new_starts, new_lbd, renumber = [], [0], [], {}
+        for i, score in enumerate(lbd):
+            if i in deleted:
+                continue
+            renumber[i] = len(new_lbd)
+            new_lits.extend(lits[starts[i]:starts[i + 1]])
+            new_starts.append(len(new_lits))
+            new_lbd.append(score)
+        self.lits, self.starts, self.lbd = new_lits, new_starts, new_lbd
+        self.num_learned -= len(deleted)
+        self.clause_copies += len(new_lbd)
+
+        for lit in self.trail:
+            var = abs(lit)
+            if reason[var] != -1:
+                reason[var] = renumber[reason[var]]
+        self.watches = watches = [[] for _ in range(len(values))]
+        for i in range(len(new_lbd)):
+            watches[new_lits[new_starts[i]]].append(i)
+            watches[new_lits[new_starts[i] + 1]].append(i)
+
+    def _cdcl(self):
+        """
+        Conflict-driven clause learning: every conflict adds its first-UIP clause and backjumps to the
+        level where that clause becomes unit. Restarts follow the Luby sequence and learned clauses
+        are thinned out whenever they outnumber a slowly growing budget.
+        """
+        budget = RESTART_BASE * luby(self.restarts + 1)
+        max_learned = max(len(self.lbd) // 3, 1000)
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                if not self.trail_lim:
+                    self.unsat = True
+                    return False
+                learned, backjump = self._analyze(conflict)
+                self._backtrack(backjump)
+                if len(learned) == 1:
+                    self._assign(learned[0])
+                else:
+                    lbd = len({self.level[abs(lit)] for lit in learned})
+                    self._assign(learned[0], self._attach(learned, lbd))
+                budget -= 1
+                continue
+
+            if budget <= 0:
+                self.restarts += 1
+                budget = RESTART_BASE * luby(self.restarts + 1)
+                self._backtrack(0)
+            if self.num_learned > max_learned:
+                self._reduce_learned()
+                max_learned += max_learned // 10
+            lit = self._next_assumption() if self.assumptions else None
+            if lit is not None:
+                if self.values[lit] == -1:
+                    return False  # the clauses and the assumptions before it imply its negation
+                self._decide(lit)
+                continue
+            lit = self._pick_branch()
+            if lit is None:
+                return True
+            self._decide(lit)
+
+    def solve(self, deadline=None, assumptions=()):
+        """
+        Returns True if the formula is satisfiable, leaving the satisfying assignment in place.
+        assumptions are literals that must hold in this solve only: they are decided before anything else,
+        so False means no model satisfies them together, and the next solve can assume something else
+        while keeping every clause learned so far.
+        Raises TimeoutError if the search is still running at deadline (a time.time() value).
+        """
+        self.deadline = deadline
+        self.assumptions = assumptions
+        self._backtrack(0)
+        if self.unsat:
+            return False
+        return self._cdcl() if self.mode == 'cdcl' else self._dpll()
+
+    def add_clause(self, clause):
+        """
+        Adds a clause between two searches, e.g. to block the model just found. The solver backtracks to
+        level 0 first, so the next solve starts over with everything learned so far.
+        """
+        self._backtrack(0)
+        values = self.values
+        clause = [lit for lit in dict.fromkeys(clause) if values[lit] != -1]  # False at level 0 means False for good
+        if any(values[lit] == 1 for lit in clause) or len(set(map(abs, clause))) < len(clause):
+            return
+        self.clause_copies += 1
+        if not clause:
+            self.unsat = True
+        elif len(clause) == 1:
+            self._assign(clause[0])
+        else:
+            self._attach(clause)
+
+    def propagate_units(self):
+        """
+        Propagates what is assigned at level 0 (the unit clauses, to begin with) outside of a search.
+        Returns False, marking the solver unsat, if that runs into a conflict, and True otherwise.
+        """
+        self._backtrack(0)
+        if not self.unsat and self._propagate() is not None:
+            self.unsat = True
+        return not self.unsat
+
+    def probe(self, lit):
+        """
+        Failed-literal probing between searches: assumes the unassigned literal lit, propagates, and undoes both.
+        Returns the literals the assumption set, lit first, or None if it ran into a conflict: -lit then holds in
+        every model and is fixed at level 0 with everything it implies, marking the solver unsat if that conflicts
+        in turn. Level 0 must be fully propagated first (see propagate_units).
+        Raises TimeoutError past the solver's deadline.
+        >>> from cnf import CNF
+        >>> formula = CNF()
+        >>> for clause in ([1, 2], [-1, 3], [-1, -3]):
+        ...     formula.add_clause(clause)
+        >>> solver = Solver(formula)
+        >>> solver.propagate_units(), solver.probe(2), solver.probe(1), solver.fixed(), solver.unsat
+        (True, [2], None, [-1, 2], False)
+        """
+        mark = len(self.trail)
+        self._decide(lit)
+        conflict = self._propagate()
+        implied = self.trail[mark:]
+        self._backtrack(0)
+        if conflict is None:
+            return implied
+        self._assign(-lit)
+        if self._propagate() is not None:
+            self.unsat = True
+        return None
+
+    def fixed(self):
+        """Returns the literals assigned at level 0, which hold in every model."""
+        self._backtrack(0)
+        return list(self.trail)
+
+    def counters(self):
+        """Returns the search counters as a dict."""
+        return {'decisions': self.decisions, 'propagations': self.propagations, 'conflicts': self.conflicts,
+                'backtracks': self.backtracks, 'restarts': self.restarts, 'learned_clauses': self.num_learned,
+                'clause_copies': self.clause_copies}
+
+    def model(self):
+        """Returns the current assignment as an array indexed by variable (1 True, -1 False, 0 unassigned)."""
+        return self.values[:self.num_vars + 1]
+
+
+def solve(cnf, mode='dpll', heuristic='first', groups=None, deadline=None):
+    """
+    Find a satisfying assignment for a CNF, searching with the given mode ('dpll' or 'cdcl') and
+    branching heuristic (one of HEURISTICS; groups lists the candidate variables 'mrv' chooses between).
+    Raises TimeoutError once deadline (a time.time() value) has passed.
+    Returns the model as an array indexed by variable number (1 True, -1 False, 0 unassigned)
+    if one exists, or None otherwise.
+    >>> from cnf import CNF
+    >>> formula = CNF()
+    >>> formula.add_clause([1, -2])
+    >>> formula.add_clause([2])
+    >>> list(solve(formula))
+    [0, 1, 1]
+    >>> formula.add_clause([-1, 2, 3])
+    >>> formula.add_clause([-1, -3])
+    >>> list(solve(formula, mode='cdcl'))
+    [0, 1, 1, -1]
+    >>> list(solve(formula, heuristic='vsids')) == list(solve(formula, heuristic='dlis'))
+    True
+    >>> formula.add_clause([-1])
+    >>> solve(formula) is None, solve(formula, mode='cdcl') is None
+    (True, True)
+    """
+    solver = Solver(cnf, mode, heuristic, groups, deadline)
+    return solver.model() if solver.solve(deadline) else None
+
+
+def models(cnf, mode='dpll', heuristic='first', groups=None, deadline=None, block=None):
+    """
+    Lazily yields every model of a CNF, in the form solve returns. After each model the same solver gets a
+    clause that rules it out and searches again, so learned clauses and activities carry over from one
+    model to the next instead of starting from scratch.
+    block lists the variables that tell models apart (every variable by default); models that only differ
+    on other variables are yielded once.
+    >>> from cnf import CNF
+    >>> formula = CNF()
+    >>> formula.add_clause([1, 2])
+    >>> [list(model) for model in models(formula)]
+    [[0, 1, 1], [0, 1, -1], [0, -1, 1]]
+    >>> len(list(models(formula, mode='cdcl', block=[1])))
+    2
+    """
+    solver = Solver(cnf, mode, heuristic, groups, deadline)
+    block = range(1, cnf.num_vars + 1) if block is None else block
+    while solver.solve(deadline):
+        model = solver.model()
+        yield model
+        solver.add_clause([-var if model[var] == 1 else var for var in block])
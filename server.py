@@ -1,17 +1,44 @@
 #!/usr/bin/env python3
 
 import os
-import html
+import sys
 import json
+import time
+import argparse
+import importlib
+import threading
 import mimetypes
 import traceback
+from itertools import islice, chain
+from urllib.parse import parse_qsl
+from contextlib import contextmanager
+from collections import OrderedDict
 
-from wsgiref.handlers import read_environ
-from wsgiref.simple_server import make_server
-
-import main as solver
+import wire
+import solution_cache
+from profiling import Stats
 
 LOCATION = os.path.realpath(os.path.dirname(__file__))
+WORKERS = os.cpu_count() or 1  # default size of the solver process pool
+SOLVE_TIMEOUT = 10.0  # seconds a /solve request may take when it does not ask for less
+MAX_PENDING = 4 * WORKERS  # solve requests admitted at once; further ones are turned away with 503
+EXTERNAL_SOLVER = os.environ.get('SUDOKU_SAT_SOLVER')  # command of an external SAT solver, see dimacs.run_solver
+CACHE_MIN_SIZE = 16  # smaller boards skip the solution cache by default: canonical_form costs more than solving them
+UNCACHED_BACKENDS = ('bitmask', 'dlx')  # backends that solve faster than a cache lookup, so skip it by default
+MAX_SESSIONS = 256  # editing sessions kept at once; the least recently used one is dropped past that
+# imported on first use rather than with the server, so that the tools built on this module start quickly
+LAZY_MODULES = ('main', 'preprocess', 'bitmask', 'dlx', 'dimacs', 'session', 'validation')
+
+# solutions already found, shared by every request this process serves (pool workers keep their own, unused)
+cache = solution_cache.SolutionCache()
+
+def uses_cache(option, backend, board):
+    """whether a solve goes through the solution cache: as its 'cache' option says, or by default for the boards
+        of at least CACHE_MIN_SIZE rows solved by a backend that is not in UNCACHED_BACKENDS
+    """
+    if option is not None:
+        return bool(option)
+    return backend not in UNCACHED_BACKENDS and isinstance(board, list) and len(board) >= CACHE_MIN_SIZE
 
 
 def parse_post(environ):
@@ -29,6 +56,33 @@ def parse_post(environ):
     except:
         return {}
 
+def parse_binary(environ, path, streamed=False):
+    """ parses a request whose body is in the binary wire format (see wire.py): the options come from the query
+        string, e.g. /solve_batch?backend=dlx&timeout=5 (values are read as JSON where they parse as JSON),
+        and the boards from the body, as 'board' for /solve and as 'boards' otherwise
+        with streamed, 'boards' is read lazily, as the boards are needed, instead of all at once
+        a body that is not a sequence of board records, or that has an empty record (which stands for no board),
+        raises wire.FormatError, answered with 400
+    """
+    payload = {}
+    for name, value in parse_qsl(environ.get("QUERY_STRING", "")):
+        try:
+            payload[name] = json.loads(value)
+        except ValueError:
+            payload[name] = value
+    try:
+        body_size = int(environ.get("CONTENT_LENGTH", 0))
+    except ValueError:
+        body_size = 0
+    boards = wire.read_boards(environ["wsgi.input"], body_size, empty=False)
+    if path == 'solve':
+        payload['board'] = next(boards, None)
+        if payload['board'] is None:
+            raise wire.FormatError("the request holds no board")
+    else:
+        payload['boards'] = boards if streamed else list(boards)
+    return payload
+
 # def find_region(n, r, c):
 #     """(slowly) find which region (as a set of locations) the given coordinates are in [0, n)"""
 #     for i in range(n):
@@ -77,40 +131,558 @@ def check_sudoku(original, result, expect_none=False):
                 } == all_nums
 
 def victory_check(payload):
-    """Takes in a dictionary as input and checks whether the board is of the correct dimensions"""
+    """the /victory_check endpoint: {'victory': whether the board is completely and correctly filled in}
+        with 'checkCoords': [r, c], the cell that was just edited, the row, column and box of that cell are checked
+        first, so a board that is still unfinished there is answered without a pass over the whole board
+    """
+    import validation
     board = payload['board']
-    empty_board = [[0] * len(board) for _ in board]
-    try:
-        assert board
-        check_sudoku(empty_board, board)
-        return {'victory': True}
-    except AssertionError:
-        return {'victory': False}
+    coords = payload.get('checkCoords')
+    if coords is not None and isinstance(board, list):
+        r, c = coords
+        if not validation.check_cell(board, r, c):
+            return {'victory': False}
+    return {'victory': validation.is_solved(board)}
+
+
+def validate_batch(payload):
+    """the /validate_batch endpoint: takes {'boards': [...], 'originals': [...]} (originals optional) and returns
+        {'valid': [...]} with, for every board, whether it is solved and keeps the givens of its original
+    """
+    import validation
+    boards, originals = payload['boards'], payload.get('originals')
+    if originals is not None and len(originals) != len(boards):
+        raise ValueError(f"got {len(boards)} boards but {len(originals)} originals")
+    return {'valid': validation.check_boards(boards, originals)}
+
+def solve_sat(board, mode='dpll', heuristic='first', at_most_one='pairwise', preprocess=True, deadline=None, stats=None):
+    """solves a 2D list sudoku board by encoding it as a SAT formula, returns the solved board or None
+        with preprocess, the board is first reduced by preprocess.reduce_board, which solves most puzzles on its own,
+        and the formula of what is left is simplified by preprocess.simplify_cnf before the search
+    """
+    import main as solver
+    import preprocess as preprocessing
+    candidates = None
+    if preprocess:
+        reduced = preprocessing.reduce_board(board, stats, deadline)
+        if reduced is None:
+            return None
+        board, candidates = reduced
+        if not candidates:
+            return board
+    formula = solver.sudoku_clauses(board, at_most_one, candidates)
+    assignments = solver.satisfying_assignment(formula, mode, heuristic, deadline, stats, simplify=preprocess)
+    if stats is None:
+        return solver.assignments_to_sudoku_board(assignments, len(board))
+    with stats.phase('decode'):
+        return solver.assignments_to_sudoku_board(assignments, len(board))
+
+
+def solve_external(board, solver_command=None, at_most_one='pairwise', deadline=None, stats=None):
+    """solves a 2D list sudoku board with an external SAT solver (EXTERNAL_SOLVER unless a command is given),
+        the formula is streamed to it as a DIMACS file, returns the solved board or None
+    """
+    import main as solver
+    import dimacs
+    formula = solver.sudoku_clauses(board, at_most_one)
+    if stats is None:
+        assignments = dimacs.external_assignment(formula, solver_command or EXTERNAL_SOLVER, deadline)
+    else:
+        with stats.phase('external'):
+            assignments = dimacs.external_assignment(formula, solver_command or EXTERNAL_SOLVER, deadline)
+    return solver.assignments_to_sudoku_board(assignments, len(board))
+
+
+class _Lazy:
+    """stands for the function module.name, whose module is imported on the first call instead of with the server"""
+
+    def __init__(self, module, name):
+        self.module, self.name = module, name
+        self.function = None
+
+    def __call__(self, *args, **kwargs):
+        if self.function is None:
+            self.function = getattr(importlib.import_module(self.module), self.name)
+        return self.function(*args, **kwargs)
+
+
+def preload():
+    """imports every module in LAZY_MODULES now, e.g. so that the pool workers forked afterwards start with them"""
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+
+
+backends = {
+    'sat': solve_sat,
+    'bitmask': _Lazy('bitmask', 'solve_board'),
+    'dlx': _Lazy('dlx', 'solve_board'),
+}
+if EXTERNAL_SOLVER:
+    backends['external'] = solve_external
 
 def solve(payload):
-    """takes in a 2D list sudoku board and returns a solved sudoku board as a 2D list"""
+    """takes in a 2D list sudoku board and returns a solved sudoku board as a 2D list
+        the payload may also be a dictionary {'board': board, 'backend': 'sat' | 'bitmask' | 'dlx', ...options}
+        where the remaining options go to the backend, e.g. 'mode' and 'heuristic' for the SAT backend
+        a 'timeout' in seconds (or an absolute time.time() 'deadline') makes the backend raise TimeoutError when exceeded
+        answers come from the solution cache when the board (or a symmetric variant of it) was solved before,
+        'cache': True or False overrides whether the cache is used (see uses_cache)
+        with 'stats': True the answer is {'solution': board or None, 'stats': {'counters', 'phases', 'seconds'}} instead,
+        see profiling.Stats
+    """
+    if isinstance(payload, dict):
+        options = dict(payload)
+        board = options.pop('board')
+        backend = options.pop('backend', 'sat')
+        use_cache = uses_cache(options.pop('cache', None), backend, board)
+        stats = Stats() if options.pop('stats', False) else None
+        timeout = options.pop('timeout', None)
+        if timeout is not None and 'deadline' not in options:
+            options['deadline'] = time.time() + float(timeout)
+    else:
+        board, options, backend, stats = payload, {}, 'sat', None
+        use_cache = uses_cache(None, backend, board)
+    result, entry = solution_cache.MISS, None
+    if use_cache:
+        if stats is None:
+            result, entry = cache.lookup(board)
+        else:
+            with stats.phase('cache'):
+                result, entry = cache.lookup(board)
+            stats.update({'cache_hit': result is not solution_cache.MISS})
+    if result is solution_cache.MISS:
+        result = backends[backend](board, stats=stats, **options)
+        if use_cache:
+            cache.store(entry, result)
+    return result if stats is None else with_stats(result, stats)
+
+
+def with_stats(solution, stats):
+    """the answer to a solve that asked for 'stats'"""
+    return {'solution': solution, 'stats': stats.as_dict()}
+
+
+def timed_solve(payload):
+    """solves one board (same payload as solve) and returns {'solution': board or None, 'seconds': solve time}
+        an exception is reported under 'error' instead of failing the whole batch
+    """
+    start = time.perf_counter()
+    try:
+        out = solve(payload)
+        result = out if isinstance(payload, dict) and payload.get('stats') else {'solution': out}
+    except Exception as e:
+        result = {'solution': None, 'error': f"{type(e).__name__}: {e}"}
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def _warm_up():
+    """runs once in every pool worker so the first real board does not pay for imports and first-call setup
+        the puzzle is an easy one: going through every backend once is the point, not searching
+        a backend that fails here (say an external solver command that does not exist) is reported and skipped: an
+        initializer that raises would break the whole pool, not just that backend
+    """
+    for backend in backends:
+        try:
+            solve({'board': [[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]], 'backend': backend})
+        except Exception as e:
+            print(f"pool worker {os.getpid()}: warming up the {backend!r} backend failed: {type(e).__name__}: {e}",
+                  file=sys.stderr)
+
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def get_pool(workers=None):
+    """returns the shared solver process pool, starting it with the given number of warmed-up workers (WORKERS by
+        default) if it is not running yet; a running pool is returned as it is, whatever number is asked for
+    """
+    workers = workers or WORKERS
+    with _pool_lock:
+        return _get_pool(workers)
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        # where workers are forked, they inherit the backends instead of importing them one by one
+        preload()
+        _pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_up)
+        _pool_workers = workers
+        # start every worker now rather than on the first batch
+        list(_pool.map(abs, range(workers)))
+    return _pool
+
+
+def solve_batch(payload):
+    """takes in a dictionary {'boards': [board, ...], ...options} (or just a list of boards),
+        solves the boards in parallel across the server's process pool with the shared options (as for solve),
+        and returns {'results': [...], 'seconds': wall time} with one timed_solve result per board, in input order
+        boards found in the solution cache are answered here, only the others are sent to the pool
+        every board gets its 'timeout', capped at SOLVE_TIMEOUT, from when a worker takes it up; a lone board goes
+        through run_with_deadline as a /solve does
+    """
+    if isinstance(payload, dict):
+        options = dict(payload)
+        boards = options.pop('boards')
+    else:
+        boards, options = payload, {}
+    cache_option = options.pop('cache', None)
+    backend = options.get('backend', 'sat')
+    # the pool size is server configuration, and the deadline is set here from the capped timeout
+    options.pop('workers', None)
+    options.pop('deadline', None)
+    options['timeout'] = min(float(options.get('timeout', SOLVE_TIMEOUT)), SOLVE_TIMEOUT)
+
+    start = time.perf_counter()
+    results = [None] * len(boards)
+    entries = [None] * len(boards)  # the cache entry of every board looked up, to store its solution under
+    misses = []
+    for i, board in enumerate(boards):
+        cached = solution_cache.MISS
+        if uses_cache(cache_option, backend, board):
+            cached, entries[i] = cache.lookup(board)
+        if cached is solution_cache.MISS:
+            misses.append(i)
+        else:
+            results[i] = {'solution': cached, 'seconds': 0.0, 'cached': True}
+    jobs = [dict(options, board=boards[i], cache=False) for i in misses]
+
+    if not WORKERS or len(jobs) <= 1:
+        solved = [_timed_solve_with_deadline(job) for job in jobs]
+    else:
+        pool = get_pool()
+        chunksize = max(1, len(jobs) // (4 * _pool_workers))
+        solved = pool.map(timed_solve, jobs, chunksize=chunksize)
+    for i, result in zip(misses, solved):
+        results[i] = result
+        if entries[i] is not None and 'error' not in result:
+            cache.store(entries[i], result['solution'])
+    return {'results': results, 'seconds': time.perf_counter() - start}
+
+
+def _timed_solve_with_deadline(job):
+    """timed_solve under run_with_deadline, with a request that gives up on the worker reported as an error"""
+    start = time.perf_counter()
+    try:
+        return run_with_deadline(timed_solve, job)
+    except TimeoutError as e:
+        return {'solution': None, 'error': f"TimeoutError: {e}", 'seconds': time.perf_counter() - start}
+
+
+class ServerBusy(Exception):
+    """raised when MAX_PENDING solve requests are already in flight"""
+
+
+_admission = threading.BoundedSemaphore(MAX_PENDING)
+_admitted_call = threading.local()  # the _Slot of the admitted request running in this thread, if any
+
+class _Slot:
+    """one admission slot, given back once its request and every pool job the request left running are done"""
+
+    def __init__(self):
+        self.holders = 1
+        self.lock = threading.Lock()
 
-    board = payload
-    formula = solver.sudoku_board_to_sat_formula(board)
-    assignments = solver.satisfying_assignment(formula)
-    sol = solver.assignments_to_sudoku_board(assignments, len(board))
-    return sol
+    def hold(self):
+        with self.lock:
+            self.holders += 1
+
+    def release(self):
+        with self.lock:
+            self.holders -= 1
+            done = not self.holders
+        if done:
+            _admission.release()
+
+@contextmanager
+def _admitted():
+    """takes an admission slot for the enclosed solve, raising ServerBusy right away if there is none"""
+    if not _admission.acquire(blocking=False):
+        raise ServerBusy(f"{MAX_PENDING} solves already in progress")
+    slot = _admitted_call.slot = _Slot()
+    try:
+        yield
+    finally:
+        _admitted_call.slot = None
+        slot.release()
+
+def admitted(endpoint):
+    """wraps an endpoint so at most MAX_PENDING calls run at once, extra calls raise ServerBusy right away"""
+    def admitted_endpoint(payload):
+        with _admitted():
+            return endpoint(payload)
+    return admitted_endpoint
+
+
+def run_with_deadline(func, options):
+    """runs func(options) in the process pool (or in this thread if WORKERS is 0) under a deadline of the
+        options' 'timeout' seconds, capped at SOLVE_TIMEOUT, and raises TimeoutError past it
+        a worker still busy when the request gives up keeps the request's admission slot until it is done, so
+        solves that overrun their deadline count against MAX_PENDING rather than pile up unseen in the pool
+    """
+    options = dict(options)
+    timeout = min(float(options.pop('timeout', SOLVE_TIMEOUT)), SOLVE_TIMEOUT)
+    options['deadline'] = time.time() + timeout
+    if not WORKERS:
+        return func(options)
+    future = get_pool().submit(func, options)
+    try:
+        # the backends stop themselves at the deadline; the grace period covers queueing and result transfer
+        return future.result(timeout=timeout + 1)
+    except TimeoutError:
+        slot = getattr(_admitted_call, 'slot', None)
+        if not future.cancel() and slot is not None:
+            slot.hold()
+            future.add_done_callback(lambda future: slot.release())
+        raise TimeoutError(f"no answer within {timeout:g} s") from None
+
+
+def solve_request(payload):
+    """the /solve endpoint: solve under run_with_deadline, answered from the solution cache when possible"""
+    options = dict(payload) if isinstance(payload, dict) else {'board': payload}
+    if not WORKERS:
+        return run_with_deadline(solve, options)
+    # the cache lives in this process, so look it up before handing the board to a worker
+    use_cache = uses_cache(options.pop('cache', None), options.get('backend', 'sat'), options['board'])
+    if use_cache:
+        start = time.perf_counter()
+        cached, entry = cache.lookup(options['board'])
+        if cached is not solution_cache.MISS:
+            if options.get('stats'):
+                stats = Stats()
+                stats.update({'cache_hit': True})
+                stats.phases['cache'] = time.perf_counter() - start
+                return with_stats(cached, stats)
+            return cached
+    result = run_with_deadline(solve, dict(options, cache=False))
+    if use_cache:
+        cache.store(entry, result['solution'] if options.get('stats') else result)
+    return result
+
+
+BATCH_CHUNK = 256  # boards of a streamed /solve_batch solved at a time
+
+def solve_binary(payload):
+    """the /solve endpoint in the binary wire format: yields the solution as one board record"""
+    options = dict(payload) if isinstance(payload, dict) else {'board': payload}
+    options.pop('stats', None)
+    yield wire.encode_board(admitted(solve_request)(options))
+
+
+def solve_batch_stream(payload):
+    """the /solve_batch endpoint in the binary wire format: reads the boards, solves them BATCH_CHUNK at a time
+        as solve_batch does and yields the solutions of every chunk as soon as it is done, so a batch of any size
+        is never held in memory whole, neither as request nor as response; a board without a solution, or whose
+        solve failed, is answered with an empty record
+        a malformed record is answered with 400 when it is in the first chunk; past that, the answer has already
+        begun, so it is cut short instead
+    """
+    options = dict(payload)
+    boards = iter(options.pop('boards'))
+    options.pop('stats', None)
+    with _admitted():
+        while True:
+            chunk = list(islice(boards, BATCH_CHUNK))
+            if not chunk:
+                return
+            results = solve_batch(dict(options, boards=chunk))['results']
+            yield wire.encode_boards(result['solution'] for result in results)
+
+
+enumerators = {
+    'sat': _Lazy('main', 'sudoku_solutions'),
+    'bitmask': _Lazy('bitmask', 'solutions'),
+    'dlx': _Lazy('dlx', 'solutions'),
+}
+
+def solutions(payload):
+    """lazily yields every solution of a board; the payload is as for solve, without 'cache' and 'stats',
+        and the backend defaults to 'dlx'
+    """
+    options = dict(payload)
+    board = options.pop('board')
+    backend = options.pop('backend', 'dlx')
+    timeout = options.pop('timeout', None)
+    if timeout is not None and 'deadline' not in options:
+        options['deadline'] = time.time() + float(timeout)
+    return enumerators[backend](board, **options)
+
+
+def count_solutions(payload):
+    """takes in a dictionary {'board': board, 'limit': 2, 'solutions': False, ...options as for solutions}
+        and counts the board's solutions, stopping as soon as limit are found ('limit': None counts them all)
+        returns {'count': k, 'complete': whether k is the exact count, 'unique': True, False or None if unknown}
+        with the solutions themselves under 'solutions' if asked for
+    """
+    options = dict(payload)
+    limit = options.pop('limit', 2)
+    keep = options.pop('solutions', False)
+    found = []
+    count = 0
+    for solution in islice(solutions(options), limit):
+        count += 1
+        if keep:
+            found.append(solution)
+    complete = limit is None or count < limit
+    result = {'count': count, 'complete': complete, 'unique': None if not complete and count < 2 else count == 1}
+    if keep:
+        result['solutions'] = found
+    return result
+
+
+def count_request(payload):
+    """the /count_solutions endpoint: count_solutions under run_with_deadline"""
+    return run_with_deadline(count_solutions, payload)
+
+
+class SessionNotFound(Exception):
+    """raised for a session id that was never started, has ended or was dropped to make room"""
+
+
+_sessions = OrderedDict()  # session id -> (lock, Session), least recently used first
+_sessions_lock = threading.Lock()
+
+def _session(payload):
+    """returns the (lock, Session) pair named by the payload's 'session' id, marking it as recently used"""
+    with _sessions_lock:
+        try:
+            _sessions.move_to_end(payload['session'])
+            return _sessions[payload['session']]
+        except KeyError:
+            raise SessionNotFound(f"no session {payload.get('session')!r}") from None
+
+
+def request_deadline(options):
+    """pops the options' 'timeout' and returns the deadline of work done in the request thread: that many seconds
+        from now, capped at SOLVE_TIMEOUT as run_with_deadline caps the work it hands to the pool
+    """
+    return time.time() + min(float(options.pop('timeout', SOLVE_TIMEOUT)), SOLVE_TIMEOUT)
+
+
+def session_start(payload):
+    """the /session_start endpoint: takes in a dictionary {'board': board, ...options} and keeps a SAT solver
+        for that board between requests (options 'mode', 'heuristic' and 'at_most_one' as for the SAT backend)
+        returns {'session': id for the other session endpoints, 'solvable': whether the board can be completed}
+        the sessions live in this process, so their solves run in the request thread; like the other session
+        endpoints, a 'timeout' (capped at SOLVE_TIMEOUT) bounds encoding and solving together
+    """
+    import secrets
+    from session import Session
+    options = dict(payload)
+    deadline = request_deadline(options)
+    session = Session(options.pop('board'), deadline=deadline, **options)
+    solvable = session.solvable(deadline)
+    session_id = secrets.token_hex(8)
+    with _sessions_lock:
+        _sessions[session_id] = (threading.Lock(), session)
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+    return {'session': session_id, 'solvable': solvable}
+
+
+def session_edit(payload):
+    """the /session_edit endpoint: takes in {'session': id, 'cell': [r, c], 'value': v} (0 clears the cell)
+        or {'session': id, 'board': board} and returns {'solvable': whether the edited board can still be completed}
+    """
+    deadline = request_deadline(dict(payload))
+    lock, session = _session(payload)
+    with lock:
+        if 'board' in payload:
+            session.update(payload['board'])
+        else:
+            r, c = payload['cell']
+            session.set(r, c, payload['value'])
+        return {'solvable': session.solvable(deadline)}
+
+
+def session_hint(payload):
+    """the /session_hint endpoint: takes in {'session': id} and returns {'cell': [r, c], 'value': v}
+        for the empty cell a player would look at next, or {'cell': None, 'value': None} if there is no hint to give
+        ('solvable' tells a full board from one that cannot be completed)
+    """
+    deadline = request_deadline(dict(payload))
+    lock, session = _session(payload)
+    with lock:
+        hint = session.hint(deadline)
+        solvable = session.solvable()
+    if hint is None:
+        return {'cell': None, 'value': None, 'solvable': solvable}
+    (r, c), value = hint
+    return {'cell': [r, c], 'value': value, 'solvable': solvable}
+
+
+def session_end(payload):
+    """the /session_end endpoint: forgets a session"""
+    with _sessions_lock:
+        _sessions.pop(payload.get('session'), None)
+    return {}
+
+
+def cache_stats(payload):
+    """the /cache_stats endpoint: hit and miss counts, entries and approximate bytes of the solution cache"""
+    return cache.stats()
 
 
 funcs = {
     'victory_check': victory_check,
-    'solve': solve,
+    'validate_batch': validate_batch,
+    'solve': admitted(solve_request),
+    'solve_batch': admitted(solve_batch),
+    'count_solutions': admitted(count_request),
+    'session_start': admitted(session_start),
+    'session_edit': admitted(session_edit),
+    'session_hint': admitted(session_hint),
+    'session_end': session_end,
+    'cache_stats': cache_stats,
 }
 
+
+# endpoints that can answer in the binary wire format, as generators of byte chunks
+streams = {
+    'solve': solve_binary,
+    'solve_batch': solve_batch_stream,
+}
+
+
 def application(environ, start_response):
     path = (environ.get("PATH_INFO", "") or "").lstrip("/")
     if path in funcs:
+        stream = path in streams and wire.CONTENT_TYPE in environ.get("HTTP_ACCEPT", "")
         try:
-            out = funcs[path](parse_post(environ))
-            body = json.dumps(out).encode("utf-8")
+            if environ.get("CONTENT_TYPE", "").startswith(wire.CONTENT_TYPE):
+                payload = parse_binary(environ, path, streamed=stream)
+            else:
+                payload = parse_post(environ)
+            if stream:
+                chunks = streams[path](payload)
+                # the first chunk is made before answering, so that errors still get their status code
+                first = next(chunks, b"")
+                start_response("200 OK", [("Content-type", wire.CONTENT_TYPE)])
+                return chain((first,), chunks)
+            out = funcs[path](payload)
+            body = json.dumps(out, separators=(",", ":")).encode("utf-8")
             status = "200 OK"
             type_ = "application/json"
+        except TimeoutError as e:
+            body = json.dumps({'error': 'timeout', 'detail': str(e)}).encode("utf-8")
+            status = "504 GATEWAY TIMEOUT"
+            type_ = "application/json"
+        except ServerBusy as e:
+            body = json.dumps({'error': 'busy', 'detail': str(e)}).encode("utf-8")
+            status = "503 SERVICE UNAVAILABLE"
+            type_ = "application/json"
+        except SessionNotFound as e:
+            body = json.dumps({'error': 'no session', 'detail': str(e)}).encode("utf-8")
+            status = "404 NOT FOUND"
+            type_ = "application/json"
+        except wire.FormatError as e:
+            body = json.dumps({'error': 'bad request', 'detail': str(e)}).encode("utf-8")
+            status = "400 BAD REQUEST"
+            type_ = "application/json"
         except Exception as e:
+            import html
             tb = traceback.format_exc()
             print(
                 "--- Python error (likely in your solver code) during the next operation:\n"
@@ -143,13 +715,114 @@ def application(environ, start_response):
     return [body]
 
 
+# behaviour of the endpoints through the WSGI application, solving in the request thread (WORKERS = 0)
+__test__ = {'endpoints': """
+    >>> import io, json, server, wire
+    >>> def call(path, body, content_type='application/json', accept=''):
+    ...     body = body if isinstance(body, bytes) else json.dumps(body).encode()
+    ...     environ = {'PATH_INFO': '/' + path, 'CONTENT_LENGTH': str(len(body)), 'CONTENT_TYPE': content_type,
+    ...                'HTTP_ACCEPT': accept, 'wsgi.input': io.BytesIO(body)}
+    ...     answer = {}
+    ...     data = b''.join(server.application(environ, lambda status, headers: answer.update(status=status)))
+    ...     return answer['status'], data if content_type == wire.CONTENT_TYPE else json.loads(data)
+    >>> workers, server.WORKERS = server.WORKERS, 0
+    >>> easy = [[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]]
+    >>> call('solve', {'board': easy, 'backend': 'dlx'})
+    ('200 OK', [[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]])
+
+    every admission slot taken: 503 right away, and the slots come back once the solves are done
+    >>> held = 0
+    >>> while server._admission.acquire(blocking=False):
+    ...     held += 1
+    >>> call('solve', {'board': easy})[0], call('session_start', {'board': easy})[0]
+    ('503 SERVICE UNAVAILABLE', '503 SERVICE UNAVAILABLE')
+    >>> for _ in range(held):
+    ...     server._admission.release()
+    >>> call('solve', {'board': easy})[0]
+    '200 OK'
+
+    a solve, or a session, that runs out of time: 504
+    >>> status, body = call('solve', {'board': [[0] * 25] * 25, 'backend': 'sat', 'timeout': 0.01, 'cache': False})
+    >>> status, body['error']
+    ('504 GATEWAY TIMEOUT', 'timeout')
+    >>> call('session_start', {'board': [[0] * 16] * 16, 'timeout': 0.001})[0]
+    '504 GATEWAY TIMEOUT'
+
+    batch results come back in input order, answered from the cache or solved
+    >>> call('solve', {'board': easy, 'cache': True})[0]
+    '200 OK'
+    >>> relabeled = [[0, 0, 0, 1], [0, 0, 0, 2], [4, 0, 0, 0], [1, 0, 0, 0]]
+    >>> unsolvable = [[1, 1, 0, 0]] + [[0] * 4] * 3
+    >>> status, body = call('solve_batch', {'boards': [easy, unsolvable, relabeled, easy], 'cache': True})
+    >>> [(result['solution'] and result['solution'][0], result.get('cached', False)) for result in body['results']]
+    [([1, 4, 3, 2], True), (None, False), ([2, 4, 3, 1], True), ([1, 4, 3, 2], True)]
+
+    the binary wire format: boards in, solutions out, and 400 for a malformed body
+    >>> status, data = call('solve_batch', wire.encode_boards([easy, unsolvable]), wire.CONTENT_TYPE, wire.CONTENT_TYPE)
+    >>> status, list(wire.read_boards(io.BytesIO(data)))
+    ('200 OK', [[[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]], None])
+    >>> call('solve', wire.encode_board(easy)[:-1], wire.CONTENT_TYPE, wire.CONTENT_TYPE)
+    ('400 BAD REQUEST', b'{"error": "bad request", "detail": "the message ends inside a board record (8 of 9 bytes)"}')
+
+    a session's answers agree with a fresh solve of the same board
+    >>> puzzle = [[0, 4, 0, 0], [0, 0, 0, 3], [4, 2, 0, 0], [0, 0, 0, 0]]
+    >>> solution = call('solve', {'board': puzzle, 'backend': 'bitmask'})[1]
+    >>> call('count_solutions', {'board': puzzle})[1]['unique']
+    True
+    >>> session = call('session_start', {'board': puzzle})[1]
+    >>> session['solvable']
+    True
+    >>> hint = call('session_hint', session)[1]
+    >>> solution[hint['cell'][0]][hint['cell'][1]] == hint['value']
+    True
+    >>> r, c = hint['cell']
+    >>> wrong = solution[r][c] % 4 + 1
+    >>> call('session_edit', dict(session, cell=[r, c], value=wrong))[1]
+    {'solvable': False}
+    >>> call('session_edit', dict(session, cell=[r, c], value=solution[r][c]))[1]
+    {'solvable': True}
+    >>> call('session_edit', dict(session, board=solution))[1], call('session_hint', session)[1]['cell']
+    ({'solvable': True}, None)
+    >>> server.WORKERS = workers
+"""}
+
+
 if __name__ == "__main__":
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import make_server, WSGIServer
+
+    class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+        """WSGI server that handles every request in its own thread, so static files and checks never wait on a solve"""
+        daemon_threads = True
+
+    parser = argparse.ArgumentParser(description="serve the sudoku UI and solver")
+    parser.add_argument('--port', type=int, default=6101)
+    parser.add_argument('--workers', type=int, default=WORKERS, help="solver processes, 0 solves in the request thread")
+    parser.add_argument('--timeout', type=float, default=SOLVE_TIMEOUT, help="longest a /solve request may take, in seconds")
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING, help="solves admitted at once before answering 503")
+    parser.add_argument('--cache-entries', type=int, default=cache.max_entries, help="solutions kept in the cache")
+    parser.add_argument('--cache-bytes', type=int, default=cache.max_bytes, help="approximate memory the cache may use")
+    parser.add_argument('--cache-file', help="load the solution cache from this JSON file and save it back on shutdown")
+    parser.add_argument('--sat-solver', default=EXTERNAL_SOLVER,
+                        help="command of a DIMACS SAT solver (e.g. kissat) to offer as the 'external' backend")
+    args = parser.parse_args()
+    if args.sat_solver:
+        EXTERNAL_SOLVER = os.environ['SUDOKU_SAT_SOLVER'] = args.sat_solver
+        backends['external'] = solve_external
+    WORKERS, SOLVE_TIMEOUT, MAX_PENDING = args.workers, args.timeout, args.max_pending
+    _admission = threading.BoundedSemaphore(MAX_PENDING)
+    cache = solution_cache.SolutionCache(args.cache_entries, args.cache_bytes, args.cache_file)
+    if WORKERS:
+        get_pool()
+
     # Initialize the WSGI server on the specified port
-    PORT = 6101
+    PORT = args.port
     print(f"starting server.  navigate to http://localhost:{PORT}/")
-    with make_server("", PORT, application) as httpd:
+    with make_server("", PORT, application, server_class=ThreadingWSGIServer) as httpd:
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("Shutting down.")
             httpd.server_close()
+            if args.cache_file:
+                cache.save()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Incremental solving for a board that is being edited cell by cell.
+
+A Session encodes the sudoku rules for its board size once, with no givens at all, and keeps that SAT solver
+for as long as the board is edited. The filled cells are passed to every solve as assumptions, so an edit is
+just a different set of assumptions: nothing is re-encoded, and the clauses the solver learned while
+answering one question stay around for the next.
+"""
+
+from math import isqrt
+
+import sat
+import grid
+from main import sudoku_clauses, candidate_groups
+from cnf import encode_formula
+
+
+class Session:
+    """
+    Solver state for one board between edits.
+    >>> session = Session([[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]])
+    >>> session.solvable()
+    True
+    >>> session.set(0, 1, 1)
+    >>> session.solvable()
+    False
+    >>> session.set(0, 1, 0)
+    >>> cell, value = session.hint()
+    >>> session.board[cell[0]][cell[1]], session.solution[cell[0]][cell[1]] == value
+    (0, True)
+    """
+
+    def __init__(self, board, mode='cdcl', heuristic='mrv', at_most_one='pairwise', deadline=None):
+        """encodes the rules and loads the solver, raising TimeoutError if that is still running at deadline"""
+        n = len(board)
+        if isqrt(n) ** 2 != n or any(len(row) != n for row in board):
+            raise ValueError("board must be n-by-n with n a perfect square")
+        self.n = n
+        self.board = [[0] * n for _ in range(n)]
+        cnf, self.variables = encode_formula(sudoku_clauses(self.board, at_most_one), deadline=deadline)
+        groups = candidate_groups(self.variables) if heuristic == 'mrv' else None
+        self.solver = sat.Solver(cnf, mode, heuristic, groups, deadline)
+        self.solution = None  # a solution of the board as it is now, or None if unknown or there is none
+        self.known = False  # whether solution is up to date with the board
+        for r, row in enumerate(board):
+            for c, value in enumerate(row):
+                if value:
+                    self.set(r, c, value)
+
+    def set(self, r, c, value):
+        """writes value into cell (r, c), 0 clears it"""
+        if not (0 <= r < self.n and 0 <= c < self.n and 0 <= value <= self.n):
+            raise ValueError(f"cannot set cell ({r}, {c}) of a {self.n}x{self.n} board to {value!r}")
+        if self.board[r][c] != value:
+            self.board[r][c] = value
+            self.known = False
+
+    def update(self, board):
+        """replaces the whole board, e.g. with what the UI shows after an edit"""
+        if len(board) != self.n or any(len(row) != self.n for row in board):
+            raise ValueError(f"expected a {self.n}x{self.n} board")
+        for r, row in enumerate(board):
+            for c, value in enumerate(row):
+                self.set(r, c, value)
+
+    def assumptions(self):
+        """the filled cells as literals of the session's formula"""
+        numbers = self.variables.numbers
+        return [numbers[((r, c), value)] for r, row in enumerate(self.board) for c, value in enumerate(row) if value]
+
+    def solvable(self, deadline=None):
+        """returns whether the board as it is now can still be completed, remembering a solution if so"""
+        if not self.known:
+            if self.solver.solve(deadline, self.assumptions()):
+                names, model, n = self.variables.names, self.solver.model(), self.n
+                self.solution = [[0] * n for _ in range(n)]
+                for var in range(1, len(names)):
+                    if model[var] == 1 and names[var][0] != 'aux':
+                        (r, c), value = names[var]
+                        self.solution[r][c] = value
+            else:
+                self.solution = None
+            self.known = True
+        return self.solution is not None
+
+    def hint(self, deadline=None):
+        """
+        returns ((r, c), value) for an empty cell, taken from a solution of the board as it is now,
+        or None if the board is full or cannot be completed
+        the cell is the one with the fewest candidates left, i.e. the one a player would look at next
+        """
+        if not self.solvable(deadline):
+            return None
+        n, board = self.n, self.board
+        t = grid.table(n)
+        cells = [v for row in board for v in row]
+        # the values each row, column and box already holds, in unit order
+        unit_values = [{cells[i] for i in unit} for unit in t.unit_cells]
+        best, best_count = None, n + 1
+        for i, (r, c, b) in enumerate(t.cell_units):
+            if not cells[i]:
+                used = unit_values[r] | unit_values[n + c] | unit_values[2 * n + b]
+                count = n + 1 - len(used | {0})
+                if count < best_count:
+                    best, best_count = divmod(i, n), count
+        if best is None:
+            return None
+        return best, self.solution[best[0]][best[1]]
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Solution cache keyed on a canonical form of the board, so puzzles that only differ by a sudoku symmetry
+share one entry.
+
+The symmetries considered are digit relabelings, row permutations within a band, band permutations,
+column permutations within a stack, stack permutations and the transpose. canonical_form orders the
+rows and columns by signatures that none of those symmetries change (how many givens a line holds, how
+full the crossing lines are and how common its digits are), tries every tie-break while there are few
+enough, and keeps the lexicographically smallest relabeled board. Highly symmetric boards with too many ties fall back to
+one tie-break: the cache may then miss an equivalent board, but a hit is always mapped back through a
+genuine symmetry, so answers stay correct.
+"""
+
+import os
+import json
+import threading
+from math import isqrt, factorial, prod
+from itertools import permutations, product
+from collections import OrderedDict
+
+CANDIDATE_LIMIT = 64  # row order x column order combinations tried per orientation
+ENTRY_OVERHEAD = 100  # rough bytes of bookkeeping per cache entry, on top of the key and solution bytes
+
+
+def _tie_groups(order, sigs):
+    """splits an ordered list of indices into runs of equal signatures"""
+    groups = []
+    for i in order:
+        if groups and sigs[groups[-1][-1]] == sigs[i]:
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+    return groups
+
+
+def _line_orders(sigs, box, allow_ties):
+    """
+    returns (count, generator) of the candidate orders of n lines (rows or columns): bands of box lines sorted by
+    their signature, lines within a band sorted by signature, trying every order of equal signatures when allow_ties
+    """
+    bands = [list(range(b * box, (b + 1) * box)) for b in range(box)]
+    band_sigs = [tuple(sorted(sigs[line] for line in band)) for band in bands]
+    band_groups = _tie_groups(sorted(range(box), key=band_sigs.__getitem__), band_sigs)
+    line_groups = [_tie_groups(sorted(band, key=sigs.__getitem__), sigs) for band in bands]
+    if not allow_ties:
+        band_groups = [[b] for group in band_groups for b in group]
+        line_groups = [[[line] for group in groups for line in group] for groups in line_groups]
+    count = (prod(factorial(len(group)) for group in band_groups)
+             * prod(factorial(len(group)) for groups in line_groups for group in groups))
+
+    def orders():
+        for band_choice in product(*(permutations(group) for group in band_groups)):
+            band_order = [b for group in band_choice for b in group]
+            for line_choice in product(*(permutations(group) for b in band_order for group in line_groups[b])):
+                yield [line for group in line_choice for line in group]
+    return count, orders
+
+
+def _signatures(grid, n):
+    """row and column signatures that are invariant under relabeling and under row/column permutations"""
+    row_count = [sum(1 for v in row if v) for row in grid]
+    col_count = [sum(1 for r in range(n) if grid[r][c]) for c in range(n)]
+    digit_count = [0] * (n + 1)
+    for row in grid:
+        for v in row:
+            digit_count[v] += 1
+    row_sigs = [(row_count[r], tuple(sorted(col_count[c] for c in range(n) if grid[r][c])),
+                 tuple(sorted(digit_count[v] for v in grid[r] if v))) for r in range(n)]
+    col_sigs = [(col_count[c], tuple(sorted(row_count[r] for r in range(n) if grid[r][c])),
+                 tuple(sorted(digit_count[grid[r][c]] for r in range(n) if grid[r][c]))) for c in range(n)]
+    # one refinement round: a line also sees the signatures of the lines crossing it at a given
+    refined_rows = [(row_sigs[r], tuple(sorted(col_sigs[c] for c in range(n) if grid[r][c]))) for r in range(n)]
+    refined_cols = [(col_sigs[c], tuple(sorted(row_sigs[r] for r in range(n) if grid[r][c]))) for c in range(n)]
+    return refined_rows, refined_cols
+
+
+def _relabeled(grid, n, rows, cols):
+    """returns (flat bytes, relabel) of the grid read in the given row/column order with digits renumbered by first appearance"""
+    relabel = [0] * (n + 1)
+    next_label = 1
+    flat = bytearray(n * n)
+    k = 0
+    for r in rows:
+        row = grid[r]
+        for c in cols:
+            v = row[c]
+            if v:
+                if not relabel[v]:
+                    relabel[v] = next_label
+                    next_label += 1
+                flat[k] = relabel[v]
+            k += 1
+    # digits missing from the board take the remaining labels in increasing order
+    for v in range(1, n + 1):
+        if not relabel[v]:
+            relabel[v] = next_label
+            next_label += 1
+    return bytes(flat), relabel
+
+
+def canonical_form(board):
+    """
+    Given an n-by-n board, returns (key, transform) where key is the canonical board as bytes (one cell per byte,
+    row by row) and transform = (transposed, row order, column order, relabel) maps the board onto it.
+    Raises ValueError for anything but an n-by-n board (n a perfect square) of integers from 0 to n.
+    >>> board = [[1, 0, 0, 0], [0, 0, 3, 0], [0, 4, 0, 0], [0, 0, 0, 2]]
+    >>> relabeled = [[4, 0, 0, 0], [0, 0, 1, 0], [0, 3, 0, 0], [0, 0, 0, 2]]
+    >>> swapped_bands = board[2:] + board[:2]
+    >>> canonical_form(board)[0] == canonical_form(relabeled)[0] == canonical_form(swapped_bands)[0]
+    True
+    >>> transposed = [list(column) for column in zip(*board)]
+    >>> canonical_form(board)[0] == canonical_form(transposed)[0]
+    True
+    >>> canonical_form([[5, 0, 0, 0], [0] * 4, [0] * 4, [0] * 4])
+    Traceback (most recent call last):
+    ...
+    ValueError: board values must be integers from 0 to 4
+    """
+    if not isinstance(board, list) or any(not isinstance(row, list) for row in board):
+        raise ValueError("board must be a list of rows")
+    n = len(board)
+    box = isqrt(n)
+    if box * box != n or any(len(row) != n for row in board):
+        raise ValueError("board must be n-by-n with n a perfect square")
+    if any(type(v) is not int or not 0 <= v <= n for row in board for v in row):
+        raise ValueError(f"board values must be integers from 0 to {n}")
+    best = None
+    for transposed in (False, True):
+        grid = [list(column) for column in zip(*board)] if transposed else board
+        row_sigs, col_sigs = _signatures(grid, n)
+        row_count, row_orders = _line_orders(row_sigs, box, True)
+        col_count, col_orders = _line_orders(col_sigs, box, True)
+        if row_count * col_count > CANDIDATE_LIMIT:
+            col_count, col_orders = _line_orders(col_sigs, box, False)
+        if row_count * col_count > CANDIDATE_LIMIT:
+            row_count, row_orders = _line_orders(row_sigs, box, False)
+        for rows in row_orders():
+            for cols in col_orders():
+                key, relabel = _relabeled(grid, n, rows, cols)
+                if best is None or key < best[0]:
+                    best = (key, (transposed, rows, cols, relabel))
+    return best
+
+
+def to_canonical(solution, transform):
+    """maps a solution of the original board to the canonical board's solution, as bytes"""
+    transposed, rows, cols, relabel = transform
+    grid = [list(column) for column in zip(*solution)] if transposed else solution
+    return bytes(relabel[grid[r][c]] for r in rows for c in cols)
+
+
+def from_canonical(canonical_solution, transform):
+    """maps a canonical solution (bytes) back to a solution of the original board, as a list of lists"""
+    transposed, rows, cols, relabel = transform
+    n = len(rows)
+    inverse = [0] * (n + 1)
+    for v, label in enumerate(relabel):
+        inverse[label] = v
+    grid = [[0] * n for _ in range(n)]
+    k = 0
+    for r in rows:
+        for c in cols:
+            grid[r][c] = inverse[canonical_solution[k]]
+            k += 1
+    return [list(column) for column in zip(*grid)] if transposed else grid
+
+
+MISS = object()
+
+
+class SolutionCache:
+    """
+    Thread-safe LRU cache of solutions keyed on canonical_form, bounded by entry count and by approximate bytes.
+    Unsolvable boards are cached too (their solution is None). With a path, entries are loaded from and
+    saved to a JSON file.
+    >>> cache = SolutionCache(max_entries=10)
+    >>> board = [[1, 0, 0, 0], [0, 0, 3, 0], [0, 4, 0, 0], [0, 0, 0, 2]]
+    >>> cache.get(board) is MISS
+    True
+    >>> cache.put(board, [[1, 2, 4, 3], [4, 3, 1, 2], [2, 4, 3, 1], [3, 1, 2, 4]])
+    >>> cache.get([[2, 0, 0, 0], [0, 0, 4, 0], [0, 3, 0, 0], [0, 0, 0, 1]])
+    [[2, 1, 3, 4], [3, 4, 2, 1], [1, 3, 4, 2], [4, 2, 1, 3]]
+    >>> cache.stats()['hits'], cache.stats()['misses']
+    (1, 1)
+    >>> solution, entry = cache.lookup([[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]])
+    >>> solution is MISS
+    True
+    >>> cache.store(entry, [[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]])
+    >>> cache.get([[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]])
+    [[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]]
+    """
+
+    def __init__(self, max_entries=10_000, max_bytes=64 * 2**20, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.entries = OrderedDict()  # canonical key -> canonical solution bytes, or None if unsolvable
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def _size(self, key, value):
+        return len(key) + (len(value) if value else 0) + ENTRY_OVERHEAD
+
+    def lookup(self, board):
+        """
+        returns (solution, entry): what get returns, and the entry to give store once a miss is solved, so a
+        board is canonicalised once whether it hits or not (the entry is None for a malformed board)
+        a malformed board is a miss, so that the backend that gets it reports the problem as usual
+        """
+        try:
+            entry = canonical_form(board)
+        except ValueError:
+            with self.lock:
+                self.misses += 1
+            return MISS, None
+        key, transform = entry
+        with self.lock:
+            value = self.entries.get(key, MISS)
+            if value is MISS:
+                self.misses += 1
+                return MISS, entry
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return (None if value is None else from_canonical(value, transform)), entry
+
+    def get(self, board):
+        """returns the cached solution of the board (None if it is known to be unsolvable), or MISS"""
+        return self.lookup(board)[0]
+
+    def store(self, entry, solution):
+        """stores the solution (None for unsolvable) of the board lookup gave the entry of, evicting the least
+        recently used entries; nothing is stored for a malformed board's None entry"""
+        if entry is None:
+            return
+        key, transform = entry
+        value = None if solution is None else to_canonical(solution, transform)
+        with self.lock:
+            self._insert(key, value)
+
+    def put(self, board, solution):
+        """stores the solution of a board (None for unsolvable); malformed boards are not stored"""
+        try:
+            entry = canonical_form(board)
+        except ValueError:
+            return
+        self.store(entry, solution)
+
+    def _insert(self, key, value):
+        old = self.entries.pop(key, MISS)
+        if old is not MISS:
+            self.bytes -= self._size(key, old)
+        self.entries[key] = value
+        self.bytes += self._size(key, value)
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            old_key, old_value = self.entries.popitem(last=False)
+            self.bytes -= self._size(old_key, old_value)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries), 'bytes': self.bytes}
+
+    def load(self):
+        """adds the entries saved in self.path, oldest first"""
+        with open(self.path) as f:
+            saved = json.load(f)
+        with self.lock:
+            for key, value in saved:
+                self._insert(bytes.fromhex(key), None if value is None else bytes.fromhex(value))
+
+    def save(self):
+        """
+        writes every entry to self.path as a JSON list of [key, solution] hex strings, oldest first
+        >>> import tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'cache.json')
+        >>> cache = SolutionCache(path=path)
+        >>> cache.put([[1, 0, 0, 0], [0, 0, 3, 0], [0, 4, 0, 0], [0, 0, 0, 2]], [[1, 2, 4, 3], [4, 3, 1, 2], [2, 4, 3, 1], [3, 1, 2, 4]])
+        >>> cache.put([[1, 1, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]], None)
+        >>> cache.save()
+        >>> loaded = SolutionCache(path=path)
+        >>> loaded.stats()['entries'], loaded.bytes == cache.bytes
+        (2, True)
+        >>> loaded.get([[2, 0, 0, 0], [0, 0, 4, 0], [0, 3, 0, 0], [0, 0, 0, 1]])
+        [[2, 1, 3, 4], [3, 4, 2, 1], [1, 3, 4, 2], [4, 2, 1, 3]]
+        >>> loaded.get([[0, 0, 2, 2], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]) is None
+        True
+        """
+        with self.lock:
+            saved = [[key.hex(), None if value is None else value.hex()] for key, value in self.entries.items()]
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(saved, f)
+        os.replace(tmp, self.path)
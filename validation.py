@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Checks whether boards are solved, with the same bitmask occupancy as bitmask.py (bit v-1 set for value v).
+
+check_cell looks at the row, column and box of one cell only, which is all an edit can change, so the UI's
+check after every keystroke costs O(n) instead of a pass over the board. is_solved makes that pass once, and
+check_boards verifies many boards at once, as a NumPy batch when NumPy is installed.
+"""
+
+from math import isqrt
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _bits(n):
+    """value -> its bit, for the values 1..n; anything else (0, out of range, not a number) has no bit"""
+    return {v: 1 << (v - 1) for v in range(1, n + 1)}
+
+
+def _complete(values, n):
+    """whether the n values hold every value 1..n exactly once"""
+    bits = _bits(n)
+    mask = 0
+    for v in values:
+        mask |= bits.get(v, 0)
+    # n values can only cover all n bits if none of them is missing or repeated
+    return mask == (1 << n) - 1
+
+
+def check_cell(board, r, c):
+    """
+    returns whether the row, column and box of cell (r, c) are complete and without duplicates
+    >>> board = [[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 0]]
+    >>> check_cell(board, 0, 0), check_cell(board, 3, 0)
+    (True, False)
+    """
+    n = len(board)
+    box = isqrt(n)
+    if box * box != n or not (0 <= r < n and 0 <= c < n):
+        return False
+    if any(not isinstance(row, list) or len(row) != n for row in board):
+        return False
+    br, bc = r - r % box, c - c % box
+    try:
+        return (_complete(board[r], n) and _complete([row[c] for row in board], n)
+                and _complete([board[i][j] for i in range(br, br + box) for j in range(bc, bc + box)], n))
+    except TypeError:  # an unhashable value
+        return False
+
+
+def is_solved(board, original=None):
+    """
+    Returns whether an n-by-n board is completely and correctly filled in, in one pass over its cells, and, given
+    the original puzzle, whether it keeps the original's givens.
+    >>> is_solved([[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 1]])
+    True
+    >>> is_solved([[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 1]], [[2, 0, 0, 0]] + [[0] * 4] * 3)
+    False
+    """
+    if not isinstance(board, list):
+        return False
+    n = len(board)
+    box = isqrt(n)
+    if not n or box * box != n or any(not isinstance(row, list) or len(row) != n for row in board):
+        return False
+    bits = _bits(n)
+    full = (1 << n) - 1
+    box_columns = [c // box for c in range(n)]
+    columns = [0] * n
+    boxes = [0] * n
+    try:
+        for r, row in enumerate(board):
+            row_mask = 0
+            first_box = (r // box) * box
+            for c, (v, b) in enumerate(zip(row, box_columns)):
+                bit = bits.get(v, 0)
+                row_mask |= bit
+                columns[c] |= bit
+                boxes[first_box + b] |= bit
+            if row_mask != full:
+                return False
+    except TypeError:  # an unhashable value
+        return False
+    if any(mask != full for mask in columns) or any(mask != full for mask in boxes):
+        return False
+    if original is not None:
+        return all(given in (0, v) for given_row, row in zip(original, board) for given, v in zip(given_row, row))
+    return True
+
+
+def check_boards(boards, originals=None):
+    """
+    returns, in order, is_solved for every board (against the original at the same index, if originals are given)
+    boards of one size are checked as one NumPy batch when NumPy is installed
+    >>> check_boards([[[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 1]], [[1, 2, 3, 4]] * 4])
+    [True, False]
+    """
+    import vectorized  # and NumPy with it, only once a batch is checked rather than with the module
+    if originals is None:
+        originals = [None] * len(boards)
+    results = [None] * len(boards)
+    if vectorized.np is not None:
+        sizes = {}
+        for i, board in enumerate(boards):
+            if isinstance(board, list):
+                sizes.setdefault((len(board), originals[i] is None), []).append(i)
+        for (n, unchecked), indices in sizes.items():
+            try:
+                valid = vectorized.solved([boards[i] for i in indices],
+                                          None if unchecked else [originals[i] for i in indices])
+            except (ValueError, TypeError):
+                continue  # ragged or non-integer boards, left to is_solved
+            for i, ok in zip(indices, valid.tolist()):
+                results[i] = ok
+    return [is_solved(board, original) if ok is None else ok
+            for board, original, ok in zip(boards, originals, results)]
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Candidate propagation for many boards at once with NumPy.
+
+A batch of equally sized boards is loaded into one (batch, n, n) integer array, and every round of naked and
+hidden singles is a handful of array operations over the whole batch instead of a Python loop per cell, so the
+easy puzzles of a bulk workload are finished here for next to nothing. Only the boards that propagation cannot
+finish are searched, one by one, by a regular backend.
+
+NumPy is optional: without it, solve_boards solves board by board with the bitmask backend and the other
+functions are unavailable.
+"""
+
+import time
+from math import isqrt
+from contextlib import nullcontext
+
+import bitmask
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_SIZE = 49  # largest board size whose candidate bitmasks fit in an int64
+
+
+def load(boards, check_values=True):
+    """
+    stacks equally sized n-by-n boards (lists of lists, 0 for empty cells) into one (batch, n, n) int64 array
+    raises ValueError for ragged or non-integer boards, boards larger than MAX_SIZE and, with check_values, any
+    value outside 0..n, the boards the solvers' own loaders turn away or find unsolvable
+    """
+    grids = np.asarray(boards)
+    if grids.dtype.kind not in 'iu':
+        raise ValueError(f"expected integer boards, got an array of {grids.dtype}")
+    grids = grids.astype(np.int64)
+    if grids.ndim != 3 or grids.shape[1] != grids.shape[2] or isqrt(grids.shape[1]) ** 2 != grids.shape[1]:
+        raise ValueError(f"expected n-by-n boards with n a perfect square, got an array of shape {grids.shape}")
+    n = grids.shape[1]
+    if n > MAX_SIZE:
+        raise ValueError(f"boards larger than {MAX_SIZE}x{MAX_SIZE} do not fit the candidate bitmasks")
+    if check_values and ((grids < 0) | (grids > n)).any():
+        raise ValueError(f"board values must be integers from 0 to {n}")
+    return grids
+
+
+def _unit_masks(bits, box):
+    """ORs the value bits of every row, column and box: (batch, n), (batch, n) and (batch, box, box) arrays"""
+    boxed = bits.reshape(len(bits), box, box, box, box)  # batch, box row, row in box, box column, column in box
+    return (np.bitwise_or.reduce(bits, axis=2), np.bitwise_or.reduce(bits, axis=1),
+            np.bitwise_or.reduce(np.bitwise_or.reduce(boxed, axis=4), axis=2))
+
+
+def _per_cell(rows, columns, boxes, box):
+    """ORs row, column and box masks into one (batch, n, n) mask per cell"""
+    return rows[:, :, None] | columns[:, None, :] | np.repeat(np.repeat(boxes, box, axis=1), box, axis=2)
+
+
+def candidates(grids):
+    """
+    returns the candidates of every cell of a (batch, n, n) array as bitmasks like bitmask.py's (bit v-1 set when
+    value v fits), 0 for filled cells
+    """
+    n = grids.shape[1]
+    bits = np.where(grids > 0, np.left_shift(1, np.maximum(grids - 1, 0)), 0)
+    used = _per_cell(*_unit_masks(bits, isqrt(n)), isqrt(n))
+    return np.where(grids == 0, ((1 << n) - 1) & ~used, 0)
+
+
+def solved(boards, originals=None):
+    """
+    returns a boolean array marking which of a list of equally sized boards are completely and correctly filled in
+    (and keep the givens of the original at the same index, if originals are given)
+    raises ValueError for ragged or non-integer boards
+    """
+    grids = load(boards, check_values=False)
+    n = grids.shape[1]
+    full = (1 << n) - 1
+    ok = ((grids > 0) & (grids <= n)).all(axis=(1, 2))
+    bits = np.left_shift(1, np.clip(grids - 1, 0, n - 1))
+    rows, columns, boxes = _unit_masks(bits, isqrt(n))
+    # n cells whose bits OR to all n values hold every value exactly once
+    ok &= (rows == full).all(axis=1) & (columns == full).all(axis=1) & (boxes == full).all(axis=(1, 2))
+    if originals is not None:
+        givens = load(originals)
+        ok &= ((givens == 0) | (givens == grids)).all(axis=(1, 2))
+    return ok
+
+
+def propagate(grids, deadline=None):
+    """
+    Fills naked singles (cells with one candidate) and hidden singles (values with one possible cell in a unit) in
+    every board of a (batch, n, n) array at once, in place, round after round until no board changes.
+    Returns a boolean array marking the boards that turned out to have no solution, clashing givens included;
+    every other board is either complete or needs a search.
+    Raises TimeoutError if it is still running at deadline (a time.time() value).
+    This is bitmask._propagate as array operations (preprocess._Candidates.singles is a third copy); a change to
+    the rules belongs in all three.
+    """
+    batch, n, _ = grids.shape
+    box = isqrt(n)
+    full = (1 << n) - 1
+    dead = np.zeros(batch, dtype=bool)
+    live = np.arange(batch)  # the boards that changed in the last round
+    while live.size:
+        if deadline is not None and time.time() > deadline:
+            raise TimeoutError("solver deadline exceeded")
+        g = grids[live]
+        count = len(live)
+        empty = g == 0
+        bits = np.where(empty, 0, np.left_shift(1, np.maximum(g - 1, 0)))
+        rows, columns, boxes = _unit_masks(bits, box)
+        # a value given twice in a unit makes the sum of its bits differ from their OR
+        clash = ((bits.sum(axis=2) != rows).any(axis=1) | (bits.sum(axis=1) != columns).any(axis=1)
+                 | (bits.reshape(count, box, box, box, box).sum(axis=(2, 4)) != boxes).any(axis=(1, 2)))
+        cand = np.where(empty, full & ~_per_cell(rows, columns, boxes, box), 0)
+        clash |= (empty & (cand == 0)).any(axis=(1, 2))
+
+        # values that fit at least one (once) or at least two (twice) cells of every unit, as in bitmask._propagate
+        boxed = cand.reshape(count, box, box, box, box)
+        singles = []
+        for unit_used, cells in ((rows, [cand[:, :, c] for c in range(n)]), (columns, [cand[:, r, :] for r in range(n)]),
+                                 (boxes, [boxed[:, :, r, :, c] for r in range(box) for c in range(box)])):
+            once = np.zeros_like(unit_used)
+            twice = np.zeros_like(unit_used)
+            for x in cells:
+                twice |= once & x
+                once |= x
+            missing = full & ~unit_used
+            # a value that is missing from a unit but fits none of its cells
+            clash |= (missing & ~once != 0).reshape(count, -1).any(axis=1)
+            singles.append(once & ~twice)
+
+        naked = np.where(cand & (cand - 1) == 0, cand, 0)
+        forced = naked | cand & _per_cell(*singles, box)
+        # two values forced into one cell; two cells forced to one value in a unit show up next round
+        clash |= (forced & (forced - 1) != 0).any(axis=(1, 2))
+        values = np.where(forced != 0, np.log2(np.maximum(forced, 1)).astype(np.int64) + 1, 0)
+        changed = ~clash & (forced != 0).any(axis=(1, 2))
+        grids[live[changed]] = np.where(forced[changed] != 0, values[changed], g[changed])
+        dead[live[clash]] = True
+        live = live[changed]
+    return dead
+
+
+def propagate_boards(boards, deadline=None):
+    """
+    Propagates a list of boards of any sizes batch by batch (one batch per size) and returns, in order, each board
+    as far as propagation got it (complete or not, as a list of lists), or None for a board with no solution.
+    Raises ValueError as load does, for the whole list, so that the caller can hand the boards to a regular backend.
+    """
+    results = [None] * len(boards)
+    sizes = {}
+    for i, board in enumerate(boards):
+        sizes.setdefault(len(board), []).append(i)
+    for indices in sizes.values():
+        grids = load([boards[i] for i in indices])
+        dead = propagate(grids, deadline)
+        for k, i in enumerate(indices):
+            if not dead[k]:
+                results[i] = grids[k].tolist()
+    return results
+
+
+def solve_boards(boards, deadline=None, stats=None):
+    """
+    Solves a list of n-by-n boards and returns their solutions in order (None for a board with no solution):
+    propagation runs over all of them at once, then the boards it leaves open are searched by the bitmask backend.
+    If a profiling.Stats is given, it receives the 'propagate' and 'search' times and how many boards were
+    'propagated' (finished by propagation alone), found 'unsolvable' by it, or 'searched'.
+    >>> solve_boards([[[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]], [[1, 1, 0, 0]] + [[0] * 4] * 3])
+    [[[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]], None]
+    """
+    if np is None:
+        return [bitmask.solve_board(board, deadline) for board in boards]
+    timed = stats.phase if stats is not None else lambda name: nullcontext()
+    with timed('propagate'):
+        propagated = propagate_boards(boards, deadline)
+    counts = {'boards': len(boards), 'propagated': 0, 'unsolvable': 0, 'searched': 0}
+    solutions = []
+    with timed('search'):
+        for board in propagated:
+            if board is None:
+                counts['unsolvable'] += 1
+            elif all(all(row) for row in board):
+                counts['propagated'] += 1
+            else:
+                counts['searched'] += 1
+                board = bitmask.solve_board(board, deadline)
+            solutions.append(board)
+    if stats is not None:
+        stats.update(counts)
+    return solutions
+
+
+# the examples that need NumPy, collected by doctest only when it is installed
+if np is not None:
+    __test__ = {'propagation': """
+    >>> easy = [[0, 0, 0, 2], [0, 0, 0, 1], [4, 0, 0, 0], [2, 0, 0, 0]]
+    >>> propagate_boards([easy, [[1, 1, 0, 0]] + [[0] * 4] * 3, [[0] * 4] * 4])
+    [[[1, 4, 3, 2], [3, 2, 4, 1], [4, 1, 2, 3], [2, 3, 1, 4]], None, [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]]
+    >>> propagate_boards([easy, [[5, 0, 0, 0]] + [[0] * 4] * 3])
+    Traceback (most recent call last):
+    ...
+    ValueError: board values must be integers from 0 to 4
+    >>> propagate_boards([[[1.0, 0, 0, 0]] + [[0] * 4] * 3])
+    Traceback (most recent call last):
+    ...
+    ValueError: expected integer boards, got an array of float64
+    >>> solved([[[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 1]], [[1, 2, 3, 5]] * 4]).tolist()
+    [True, False]
+    """}
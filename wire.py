@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Compact binary encoding of boards for bulk traffic with the server, as an alternative to JSON.
+
+A message is a sequence of board records, one after the other, with no header:
+    1 byte      the board size n, or 0 for no board (a puzzle without a solution)
+    cells       the n * n cells row by row, 0 for empty: two cells per byte (high nibble first, the last byte
+                padded with 0) when n < 16, one byte per cell otherwise
+A 9x9 board takes 42 bytes this way, against over 250 as JSON, and reading it is a couple of C-level byte
+operations instead of a JSON parse. The server speaks it on /solve and /solve_batch when a request is sent as
+CONTENT_TYPE and when CONTENT_TYPE is in the Accept header; see server.parse_binary.
+"""
+
+CONTENT_TYPE = 'application/x-sudoku'
+READ_SIZE = 1 << 16  # bytes read from a message at a time
+
+
+class FormatError(ValueError):
+    """raised for a message that is not a sequence of well-formed board records"""
+
+
+_HIGH = bytes(v << 4 & 0xff for v in range(256))  # a cell moved to the high nibble
+_UNPACK_HIGH = bytes(v >> 4 for v in range(256))
+_UNPACK_LOW = bytes(v & 0x0f for v in range(256))
+
+
+def encode_board(board):
+    """
+    Returns one board record, for a board given as a list of lists or None.
+    >>> encode_board([[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]]).hex()
+    '041000000000000002'
+    >>> encode_board(None)
+    b'\\x00'
+    """
+    if board is None:
+        return b'\0'
+    n = len(board)
+    if not 0 < n < 256:
+        raise ValueError(f"board size {n} does not fit the wire format")
+    cells = bytes(v for row in board for v in row)
+    if len(cells) != n * n or max(cells) > n:
+        raise ValueError(f"expected an {n}x{n} board with values 0 to {n}")
+    if n >= 16:
+        return bytes((n,)) + cells
+    if len(cells) % 2:
+        cells += b'\0'
+    high, low = cells[0::2].translate(_HIGH), cells[1::2]
+    return bytes((n,)) + (int.from_bytes(high, 'big') | int.from_bytes(low, 'big')).to_bytes(len(high), 'big')
+
+
+def encode_boards(boards):
+    """returns the records of several boards as one message"""
+    return b''.join(map(encode_board, boards))
+
+
+def _decode(n, packed, count):
+    """the board of a record's cells, raising FormatError for a value above n; count numbers the record"""
+    if n < 16:
+        cells = bytearray(2 * len(packed))
+        cells[0::2] = packed.translate(_UNPACK_HIGH)
+        cells[1::2] = packed.translate(_UNPACK_LOW)
+    else:
+        cells = packed
+    if max(cells) > n:
+        raise FormatError(f"board {count} holds a value above {n}")
+    return [list(cells[k:k + n]) for k in range(0, n * n, n)]
+
+
+def read_boards(f, limit=None, empty=True):
+    """
+    Lazily yields every board of a message read from a binary file (None for empty records), reading READ_SIZE
+    bytes at a time. With limit, at most that many bytes are read, as a request body of that Content-Length must
+    be. Raises FormatError if the message ends inside a record, at a record holding a value above its size, or at
+    an empty record if empty is False, as for a request, where an empty record stands for no board at all.
+    >>> import io
+    >>> message = encode_boards([[[1, 2], [2, 1]], None, [[0] * 16] * 16])
+    >>> [board if board is None else len(board) for board in read_boards(io.BytesIO(message))]
+    [2, None, 16]
+    >>> boards = [[[1, 0, 0, 0], [0, 0, 3, 0], [0, 4, 0, 0], [0, 0, 0, 2]], [[v % 16 for v in range(r, r + 16)] for r in range(16)]]
+    >>> list(read_boards(io.BytesIO(encode_boards(boards)))) == boards
+    True
+    >>> list(read_boards(io.BytesIO(message), empty=False))
+    Traceback (most recent call last):
+    ...
+    wire.FormatError: empty record in place of board 2
+    >>> list(read_boards(io.BytesIO(bytes((4,)) + bytes.fromhex('5000000000000000'))))
+    Traceback (most recent call last):
+    ...
+    wire.FormatError: board 1 holds a value above 4
+    """
+    remaining = limit
+
+    def read():
+        nonlocal remaining
+        size = READ_SIZE if remaining is None else min(READ_SIZE, remaining)
+        data = f.read(size) if size > 0 else b''
+        if remaining is not None:
+            remaining -= len(data)
+        return data
+
+    buffer, pos = b'', 0
+    count = 0
+    while True:
+        if pos == len(buffer):
+            buffer, pos = read(), 0
+            if not buffer:
+                return
+        n = buffer[pos]
+        count += 1
+        if not n:
+            if not empty:
+                raise FormatError(f"empty record in place of board {count}")
+            pos += 1
+            yield None
+            continue
+        end = pos + 1 + ((n * n + 1) // 2 if n < 16 else n * n)
+        while len(buffer) < end:
+            more = read()
+            if not more:
+                raise FormatError(f"the message ends inside a board record ({len(buffer) - pos} of {end - pos} bytes)")
+            buffer, end, pos = buffer[pos:] + more, end - pos, 0
+        yield _decode(n, buffer[pos + 1:end], count)
+        pos = end